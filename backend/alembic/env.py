@@ -26,7 +26,7 @@ if config.config_file_name is not None:
 
 # ✅ Import your SQLAlchemy Base and models
 from app.database import Base
-from app.models import user, stock_cache  # import all models to register them
+from app.models import user, stock_cache, price_history  # import all models to register them
 
 # ✅ Let Alembic generate schema diffs
 target_metadata = Base.metadata
@@ -0,0 +1,43 @@
+"""add stock_cache sort and filter indexes
+
+Revision ID: 0416f0a86f50
+Revises: c30c3aa3038c
+Create Date: 2026-10-18 11:12:40.204517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0416f0a86f50'
+down_revision: Union[str, None] = 'c30c3aa3038c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SORT_COLUMNS = ['price', 'percent_change', 'volume', 'market_cap']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column in SORT_COLUMNS:
+        op.create_index(f'ix_stock_cache_{column}_symbol', 'stock_cache', [column, 'symbol'], unique=False)
+        if op.get_bind().dialect.name == 'postgresql':
+            op.create_index(
+                f'ix_stock_cache_{column}_desc',
+                'stock_cache',
+                [sa.text(f'{column} DESC NULLS LAST'), sa.text('symbol DESC')],
+                unique=False,
+            )
+    op.create_index('ix_stock_cache_exchange_symbol', 'stock_cache', ['exchange', 'symbol'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stock_cache_exchange_symbol', table_name='stock_cache')
+    for column in reversed(SORT_COLUMNS):
+        if op.get_bind().dialect.name == 'postgresql':
+            op.drop_index(f'ix_stock_cache_{column}_desc', table_name='stock_cache')
+        op.drop_index(f'ix_stock_cache_{column}_symbol', table_name='stock_cache')
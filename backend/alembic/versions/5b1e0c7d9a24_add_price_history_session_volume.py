@@ -0,0 +1,33 @@
+"""add price_history session_volume
+
+Revision ID: 5b1e0c7d9a24
+Revises: d6d2f91b69f4
+Create Date: 2026-10-18 16:05:12.481733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e0c7d9a24'
+down_revision: Union[str, None] = 'd6d2f91b69f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('price_history', sa.Column('session_volume', sa.BigInteger(), nullable=True))
+    # Existing bars stored the cumulative day volume and session-level o/h/l:
+    # keep the cumulative value where it belongs and make the bars single-price
+    op.execute("UPDATE price_history SET session_volume = volume, volume = NULL, "
+               "open = close, high = close, low = close")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("UPDATE price_history SET volume = session_volume")
+    op.drop_column('price_history', 'session_volume')
@@ -0,0 +1,28 @@
+"""add stock_cache last_updated
+
+Revision ID: 7eb18a390d37
+Revises: 0416f0a86f50
+Create Date: 2026-10-18 11:48:05.630182
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7eb18a390d37'
+down_revision: Union[str, None] = '0416f0a86f50'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('stock_cache', sa.Column('last_updated', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('stock_cache', 'last_updated')
@@ -0,0 +1,46 @@
+"""add price_history table
+
+Revision ID: c30c3aa3038c
+Revises: cbc43011777d
+Create Date: 2026-10-18 10:03:27.518920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c30c3aa3038c'
+down_revision: Union[str, None] = 'cbc43011777d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'price_history',
+        sa.Column('symbol', sa.String(), nullable=False),
+        sa.Column('ts', sa.BigInteger(), nullable=False),
+        sa.Column('open', sa.Float(), nullable=True),
+        sa.Column('high', sa.Float(), nullable=True),
+        sa.Column('low', sa.Float(), nullable=True),
+        sa.Column('close', sa.Float(), nullable=False),
+        sa.Column('volume', sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint('symbol', 'ts')
+    )
+    op.create_index(
+        'ix_price_history_symbol_ts_covering',
+        'price_history',
+        ['symbol', 'ts'],
+        unique=False,
+        postgresql_include=['open', 'high', 'low', 'close', 'volume'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_price_history_symbol_ts_covering', table_name='price_history')
+    op.drop_table('price_history')
@@ -0,0 +1,86 @@
+"""pack stock_cache history as float64 blob
+
+Revision ID: cbc43011777d
+Revises: 78331270068e
+Create Date: 2026-10-18 09:12:41.204311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import numpy as np
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cbc43011777d'
+down_revision: Union[str, None] = '78331270068e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+HISTORY_DTYPE = np.dtype("<f8")
+
+
+def _csv_to_blob(raw):
+    """Parses the legacy CSV history (tolerating stray braces) into packed float64."""
+    points = []
+    for point in (raw or "").replace("{", "").replace("}", "").split(","):
+        try:
+            points.append(float(point))
+        except ValueError:
+            continue
+    return np.asarray(points, dtype=HISTORY_DTYPE).tobytes()
+
+
+def _blob_to_csv(blob):
+    if not blob:
+        return ""
+    return ",".join(str(x) for x in np.frombuffer(blob, dtype=HISTORY_DTYPE).tolist())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('stock_cache', sa.Column('history_packed', sa.LargeBinary(), nullable=True))
+
+    bind = op.get_bind()
+    stock_cache = sa.table(
+        'stock_cache',
+        sa.column('symbol', sa.String()),
+        sa.column('history', sa.String()),
+        sa.column('history_packed', sa.LargeBinary()),
+    )
+    rows = bind.execute(sa.select(stock_cache.c.symbol, stock_cache.c.history)).all()
+    if rows:
+        bind.execute(
+            stock_cache.update()
+            .where(stock_cache.c.symbol == sa.bindparam('b_symbol'))
+            .values(history_packed=sa.bindparam('b_packed')),
+            [{'b_symbol': symbol, 'b_packed': _csv_to_blob(history)} for symbol, history in rows],
+        )
+
+    op.drop_column('stock_cache', 'history')
+    op.alter_column('stock_cache', 'history_packed', new_column_name='history')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('stock_cache', sa.Column('history_csv', sa.String(), nullable=True))
+
+    bind = op.get_bind()
+    stock_cache = sa.table(
+        'stock_cache',
+        sa.column('symbol', sa.String()),
+        sa.column('history', sa.LargeBinary()),
+        sa.column('history_csv', sa.String()),
+    )
+    rows = bind.execute(sa.select(stock_cache.c.symbol, stock_cache.c.history)).all()
+    if rows:
+        bind.execute(
+            stock_cache.update()
+            .where(stock_cache.c.symbol == sa.bindparam('b_symbol'))
+            .values(history_csv=sa.bindparam('b_csv')),
+            [{'b_symbol': symbol, 'b_csv': _blob_to_csv(history)} for symbol, history in rows],
+        )
+
+    op.drop_column('stock_cache', 'history')
+    op.alter_column('stock_cache', 'history_csv', new_column_name='history')
@@ -0,0 +1,30 @@
+"""add stock_cache profile/metrics timestamps
+
+Revision ID: d6d2f91b69f4
+Revises: 7eb18a390d37
+Create Date: 2026-10-18 12:20:51.118374
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6d2f91b69f4'
+down_revision: Union[str, None] = '7eb18a390d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('stock_cache', sa.Column('profile_updated_at', sa.BigInteger(), nullable=True))
+    op.add_column('stock_cache', sa.Column('metrics_updated_at', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('stock_cache', 'metrics_updated_at')
+    op.drop_column('stock_cache', 'profile_updated_at')
@@ -1,14 +1,21 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import firebase_admin
 from firebase_admin import auth as firebase_auth, credentials
 import os
 import json
+import hashlib
+import logging
 from dotenv import load_dotenv
 
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from app.database import get_db
 from app.models.user import User as DBUser
+from app.metrics import register_cache
+from app.services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -37,24 +44,33 @@ if not firebase_admin._apps:
 # Use HTTP Bearer Auth to expect token in "Authorization: Bearer <token>" header
 http_bearer = HTTPBearer()
 
+# Verified token claims, keyed by token hash and kept until the token's own `exp`
+token_cache = TTLCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")))
 
-def get_db():
-    """
-    FastAPI dependency to get a SQLAlchemy DB session.
-    Ensures proper session handling with yield.
-    """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# uid -> profile (including is_admin) for recently seen users
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+)
+# Hit/miss counters for both caches are exported on /metrics
+register_cache("token", token_cache)
+register_cache("user", user_cache)
+
+# Create a set of admin emails defined in .env (comma-separated)
+ADMIN_EMAILS = set(
+    email.strip()
+    for email in os.getenv("ADMIN_EMAILS", "").split(",")
+    if email.strip()
+)
 
-        
 
 def verify_token(token: str):
     """
     Verifies a Firebase ID token and returns the decoded token payload.
 
+    Successful verifications are cached (by SHA-256 of the token) until the
+    token expires, so repeat requests in a session skip signature checks.
+
     Args:
         token (str): Firebase JWT.
 
@@ -64,65 +80,112 @@ def verify_token(token: str):
     Raises:
         HTTPException: If token is invalid or expired.
     """
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached = token_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+
     try:
         decoded_token = firebase_auth.verify_id_token(token)
-        return {
+        claims = {
             "uid": decoded_token.get("uid"),
             "email": decoded_token.get("email"),
             "name": decoded_token.get("name"),
             "picture": decoded_token.get("picture"),
         }
+        token_cache.set(key, claims, expires_at=decoded_token.get("exp", 0))
+        return dict(claims)
     except Exception as e:
-        print(f"[Firebase] Token verification failed: {e}")
+        logger.warning("Firebase token verification failed: %s", e)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Firebase token")
 
 
 
+def _user_profile(db_user: DBUser) -> dict:
+    """Plain-dict copy of the columns cached for an authenticated user."""
+    return {
+        "uid": db_user.uid,
+        "email": db_user.email,
+        "name": db_user.name,
+        "picture": db_user.picture,
+        "is_admin": bool(db_user.is_admin),
+    }
+
+
+def invalidate_user(uid: str):
+    """
+    Drops a user's cached profile so the next request reloads it from the DB.
+    Called automatically on ORM inserts/updates of the users table.
+    """
+    user_cache.pop(uid)
+
+
+@event.listens_for(DBUser, "after_insert")
+@event.listens_for(DBUser, "after_update")
+def _invalidate_cached_user(mapper, connection, target):
+    invalidate_user(target.uid)
+
+
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
     db: Session = Depends(get_db),
 ) -> DBUser:
     """
     FastAPI dependency that verifies the Firebase JWT and returns the corresponding user from the DB.
-    Creates a new user entry if it does not exist yet.
+    Creates a new user entry if it does not exist yet, flagging admins via ADMIN_EMAILS.
+
+    The user is resolved once per request (FastAPI caches the dependency and
+    the result is also stored on request.state.user) and its profile is kept
+    in a short-TTL process-wide cache, so most requests skip the users query.
 
     Args:
+        request (Request): Incoming request; receives the resolved user.
         credentials (HTTPAuthorizationCredentials): The Bearer token passed in the Authorization header.
         db (Session): SQLAlchemy database session.
 
     Returns:
-        DBUser: The user ORM object corresponding to the Firebase UID.
+        DBUser: A detached user object populated from the cached profile.
     """
     # Decode the token and retrieve Firebase user info
     firebase_user = verify_token(credentials.credentials)
+    uid = firebase_user["uid"]
 
-    # Attempt to fetch the user from the local database
-    db_user = db.query(DBUser).filter(DBUser.uid == firebase_user["uid"]).first()
+    profile = user_cache.get(uid)
+    if profile is None:
+        # Attempt to fetch the user from the local database
+        db_user = db.query(DBUser).filter(DBUser.uid == uid).first()
 
-    # If the user does not exist in DB, create a new record
-    if not db_user:
-        db_user = DBUser(
-            uid=firebase_user["uid"],
-            email=firebase_user["email"],
-            name=firebase_user["name"],
-            picture=firebase_user["picture"],
-        )
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        # If the user does not exist in DB, create a new record
+        if not db_user:
+            db_user = DBUser(
+                uid=uid,
+                email=firebase_user["email"],
+                name=firebase_user["name"],
+                picture=firebase_user["picture"],
+                is_admin=firebase_user["email"] in ADMIN_EMAILS,
+            )
+            db.add(db_user)
+            db.commit()
+            db.refresh(db_user)
 
-    # Return the ORM user object
-    return db_user
+        profile = _user_profile(db_user)
+        user_cache.set(uid, profile)
 
+    # Transient copy: never attached to a session, safe to share across dependencies
+    user = DBUser(**profile)
+    request.state.user = user
+    return user
 
 
-def require_admin(user=Depends(get_current_user), db: Session = Depends(get_db)):
+
+def require_admin(user: DBUser = Depends(get_current_user)):
     """
     FastAPI dependency that enforces admin-only access by checking user's is_admin flag.
+    Reuses the user already resolved for this request instead of querying again.
 
     Args:
-        user: The authenticated user (from Firebase token).
-        db (Session): SQLAlchemy DB session.
+        user (DBUser): The authenticated user (from get_current_user).
 
     Returns:
         DBUser: The user instance if admin check passes.
@@ -130,11 +193,8 @@ def require_admin(user=Depends(get_current_user), db: Session = Depends(get_db))
     Raises:
         HTTPException: If the user is not marked as an admin.
     """
-    # Retrieve the full DB user object using UID from the auth token
-    db_user = db.query(DBUser).filter(DBUser.uid == user["uid"]).first()
-
-    # If user doesn't exist or isn't marked as admin in DB, deny access
-    if not db_user or not db_user.is_admin:
+    # Deny access unless the user is marked as admin in DB
+    if not user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
 
-    return db_user
+    return user
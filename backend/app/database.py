@@ -1,17 +1,109 @@
-from sqlalchemy import create_engine
+import time
+import threading
+from sqlalchemy import create_engine, exc
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
 from dotenv import load_dotenv
 
+from app.metrics import register_collector
+
 # Load environment variables from a .env file (if it exists)
 load_dotenv()
 
 # Get the DATABASE_URL from environment variables (e.g., PostgreSQL URI)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connection pool tuning
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))                    # persistent connections
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))             # extra connections under burst
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))           # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))           # seconds before a connection is replaced
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # Postgres only; 0 disables
+
+
+class PoolStats:
+    """
+    Running counters for connection checkouts from the pool.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+
+    def record(self, waited: float, overflowed: bool):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            if overflowed:
+                self.overflow_events += 1
+
+    def record_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that times every checkout and counts overflow connections and
+    pool timeouts, so blocked request threads show up in /metrics.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        overflow_before = self.overflow()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record_timeout()
+            raise
+        overflowed = self.overflow() > max(0, overflow_before)
+        pool_stats.record(time.perf_counter() - start, overflowed)
+        return conn
+
+
+def build_engine(url: str):
+    """
+    Creates the application's SQLAlchemy engine from the DB_* settings.
+
+    Args:
+        url (str): Database URL.
+
+    Returns:
+        Engine: Configured engine.
+    """
+    if url and url.startswith("sqlite") and ":memory:" in url:
+        # In-memory SQLite keeps one connection per thread; pool settings don't apply
+        return create_engine(url, connect_args={"check_same_thread": False})
+
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS and url and url.startswith("postgresql"):
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+    return create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
 # Create a SQLAlchemy engine using the database URL
-engine = create_engine(DATABASE_URL)
+engine = build_engine(DATABASE_URL)
 
 # Create a configured session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -20,6 +112,51 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def pool_metrics() -> dict:
+    """
+    Snapshot of live pool state plus cumulative checkout counters.
+
+    Returns:
+        dict: size, checked_in, checked_out, overflow and checkout statistics.
+    """
+    pool = engine.pool
+    metrics = {
+        "size": pool.size() if hasattr(pool, "size") else 0,
+        "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else 0,
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else 0,
+        "overflow": max(0, pool.overflow()) if hasattr(pool, "overflow") else 0,
+    }
+    with pool_stats.lock:
+        metrics.update(
+            checkouts_total=pool_stats.checkouts,
+            checkout_wait_seconds_total=pool_stats.wait_seconds_total,
+            checkout_wait_seconds_max=pool_stats.wait_seconds_max,
+            overflow_events_total=pool_stats.overflow_events,
+            checkout_timeouts_total=pool_stats.timeouts,
+        )
+    return metrics
+
+
+@register_collector
+def _collect_pool_metrics():
+    m = pool_metrics()
+    return [
+        ("db_pool_size", "gauge", "Configured persistent pool size.", [("", {}, m["size"])]),
+        ("db_pool_checked_in", "gauge", "Idle connections in the pool.", [("", {}, m["checked_in"])]),
+        ("db_pool_checked_out", "gauge", "Connections currently in use.", [("", {}, m["checked_out"])]),
+        ("db_pool_overflow", "gauge", "Connections open beyond pool_size.", [("", {}, m["overflow"])]),
+        ("db_pool_checkouts_total", "counter", "Connection checkouts.", [("", {}, m["checkouts_total"])]),
+        ("db_pool_checkout_wait_seconds_total", "counter", "Time spent waiting for a connection.",
+         [("", {}, m["checkout_wait_seconds_total"])]),
+        ("db_pool_checkout_wait_seconds_max", "gauge", "Longest single checkout wait.",
+         [("", {}, m["checkout_wait_seconds_max"])]),
+        ("db_pool_overflow_events_total", "counter", "Checkouts that opened an overflow connection.",
+         [("", {}, m["overflow_events_total"])]),
+        ("db_pool_checkout_timeouts_total", "counter", "Checkouts that timed out waiting for a connection.",
+         [("", {}, m["checkout_timeouts_total"])]),
+    ]
+
+
 def get_db():
     """
     FastAPI dependency that yields a SQLAlchemy DB session.
@@ -33,3 +170,21 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def dialect_insert(db):
+    """
+    Returns the dialect-specific insert() construct for the session's database.
+    Both PostgreSQL and SQLite variants support ON CONFLICT upserts.
+
+    Args:
+        db (Session): SQLAlchemy session (or connection) bound to the engine.
+
+    Returns:
+        Callable: `insert` from sqlalchemy.dialects.postgresql or .sqlite.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert
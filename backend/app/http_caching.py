@@ -0,0 +1,114 @@
+import hashlib
+from typing import Callable, Dict, Hashable, Optional, Tuple
+from fastapi import HTTPException, Request, Response
+
+from app.serialization import (
+    COMPRESS_MIN_BYTES,
+    compress,
+    negotiate_encoding,
+    negotiate_format,
+    supported_formats,
+)
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Builds a strong ETag from a response body's content hash.
+
+    Args:
+        body (bytes): Serialized response body.
+
+    Returns:
+        str: Quoted ETag value, e.g. '"3f2a..."'.
+    """
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Checks the request's If-None-Match header against an ETag.
+    Weak validators (W/"...") and the "*" wildcard are honoured.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    media_type: str = "application/json",
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Returns 304 Not Modified when the client already holds `etag`,
+    otherwise the full body tagged with it.
+
+    `Cache-Control: no-cache` lets browsers keep the body but forces them to
+    revalidate on every poll, which is what sends If-None-Match back to us.
+
+    Args:
+        request (Request): Incoming request.
+        body (bytes): Serialized response body.
+        etag (str): ETag for `body` (see make_etag).
+        media_type (str): Content type of `body`.
+        headers (dict, optional): Extra headers (e.g. Vary, Content-Encoding).
+
+    Returns:
+        Response: 304 with no body, or 200 with `body`.
+    """
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def _uncached(key: Hashable, build: Callable[[], bytes]) -> Tuple[bytes, str]:
+    body = build()
+    return body, make_etag(body)
+
+
+def negotiated_response(
+    request: Request,
+    render: Callable[[str], bytes],
+    variant: Callable[[Hashable, Callable[[], bytes]], Tuple[bytes, str]] = _uncached,
+) -> Response:
+    """
+    Serves a body in the format the client asked for via Accept (JSON,
+    MessagePack or Arrow IPC), compressed per Accept-Encoding when large,
+    with the usual ETag / 304 handling.
+
+    Args:
+        request (Request): Incoming request.
+        render: Callable producing the body for a media type from
+            serialization.supported_formats().
+        variant: Memoizer called as variant(key, build) -> (body, etag), e.g.
+            backed by Snapshot.variant; by default nothing is cached.
+
+    Returns:
+        Response: The negotiated (and possibly compressed) representation.
+
+    Raises:
+        HTTPException: 406 if none of the accepted formats can be produced.
+    """
+    fmt = negotiate_format(request.headers.get("accept"))
+    if fmt is None:
+        raise HTTPException(status_code=406, detail=f"Acceptable formats: {', '.join(supported_formats())}")
+
+    body, etag = variant((fmt,), lambda: render(fmt))
+    headers = {"Vary": "Accept, Accept-Encoding"}
+
+    coding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if coding and len(body) >= COMPRESS_MIN_BYTES:
+        plain = body
+        body, etag = variant((fmt, coding), lambda: compress(plain, coding))
+        headers["Content-Encoding"] = coding
+
+    return conditional_response(request, body, etag, media_type=fmt, headers=headers)
@@ -0,0 +1,120 @@
+import os
+import sys
+import copy
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from typing import Optional
+
+import orjson
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Minimum level for every logger (DEBUG, INFO, WARNING, ...)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# "json" (one object per line) or "text"; scripts default to text
+LOG_FORMAT = os.getenv("LOG_FORMAT")
+
+# Fraction of successful requests written to the access log (errors are always kept)
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "0.1"))
+
+ACCESS_LOGGER = "marketmuse.access"
+
+# LogRecord attributes that are not caller-supplied `extra=` fields
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON objects: ts, level, logger, msg,
+    any `extra=` fields, and the traceback under "exc" when present.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records with the message and traceback rendered to text but
+    otherwise unformatted, so the listener's formatter still sees the
+    `extra=` fields.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class AccessSampler(logging.Filter):
+    """
+    Keeps every access record with status >= 500 (or level >= WARNING) and
+    a random `rate` fraction of the rest.
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or getattr(record, "status", 0) >= 500:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+def setup_logging(default_format: str = "json") -> logging.handlers.QueueListener:
+    """
+    Routes all logging through a non-blocking queue.
+
+    Loggers only enqueue records (QueueHandler); a QueueListener thread does
+    the formatting and the writes to stdout, so request handlers never wait
+    on the terminal or a log shipper. Safe to call more than once.
+
+    Args:
+        default_format (str): "json" or "text", used when LOG_FORMAT is unset.
+
+    Returns:
+        QueueListener: The running listener (stopped automatically at exit).
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    fmt = (LOG_FORMAT or default_format).lower()
+    output = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.handlers[:] = [_QueueHandler(log_queue)]
+
+    logging.getLogger(ACCESS_LOGGER).addFilter(AccessSampler(ACCESS_LOG_SAMPLE_RATE))
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
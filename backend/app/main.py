@@ -1,17 +1,50 @@
-from fastapi import FastAPI
+import os
+import hmac
+import time
+import asyncio
+import logging
+from fastapi import Depends, FastAPI, HTTPException, Request
 from app.routers import stocks, users, watchlist
 from fastapi.middleware.cors import CORSMiddleware
 from app import database
 from contextlib import asynccontextmanager
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.metrics import Counter, Histogram, render_prometheus
+from app.logging_config import ACCESS_LOGGER, setup_logging
+from app.services.price_stream import price_broadcaster, NotifyListener
+
+# Queue-backed JSON logging for the whole process
+setup_logging()
+access_logger = logging.getLogger(ACCESS_LOGGER)
+
+# Bearer token Prometheus must send to scrape /metrics; without one, only
+# loopback clients (a sidecar or ssh tunnel) may scrape
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+# Per-route request metrics, labelled by route template to keep cardinality bounded
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route.", ("method", "route"),
+)
+http_requests_total = Counter(
+    "http_requests_total", "Requests by route and status code.", ("method", "route", "status"),
+)
 
 # Lifecycle context for app startup and shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Runs once on startup: ensures DB tables are created from SQLAlchemy models
     database.Base.metadata.create_all(bind=database.engine)
+
+    # Attach the price stream to this loop and relay refresh commits from other processes
+    loop = asyncio.get_running_loop()
+    price_broadcaster.bind(loop)
+    listener = NotifyListener(database.engine, price_broadcaster)
+    listener.start(loop)
+
     yield
     # Runs once on shutdown (can be used to clean up resources if needed)
+    listener.stop()
 
 # Instantiate FastAPI app with lifespan hook
 app = FastAPI(title="MarketMuse - Stock Prediction API", lifespan=lifespan)
@@ -29,6 +62,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],  # readable by browser clients
 )
 
 # Register route handlers from modular routers
@@ -36,13 +70,32 @@ app.include_router(stocks.router)
 app.include_router(users.router)
 app.include_router(watchlist.router)
 
-# Middleware to log every HTTP request and its response status
+# Middleware recording latency/status per route and a sampled access log
 @app.middleware("http")
 async def log_all_requests(request, call_next):
-    print(f"➡️ {request.method} {request.url}")
-    response = await call_next(request)
-    print(f"⬅️ {response.status_code}")
-    return response
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        # The matched route (set on the scope by the router) gives the path template
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        http_request_duration.observe(elapsed, request.method, route_path)
+        http_requests_total.inc(request.method, route_path, status)
+        access_logger.info(
+            "%s %s %s", request.method, request.url.path, status,
+            extra={
+                "method": request.method,
+                "path": request.url.path,
+                "route": route_path,
+                "status": status,
+                "duration_ms": round(elapsed * 1000, 2),
+            },
+        )
 
 # Root route for API base URL
 @app.api_route("/", methods=["GET", "HEAD"])
@@ -53,3 +106,24 @@ def root():
 @app.get("/ping")
 def ping():
     return {"message": "pong"}
+
+def require_metrics_access(request: Request):
+    """
+    Guards /metrics on the public port: the request must carry
+    `Authorization: Bearer <METRICS_TOKEN>`, or come from loopback when no
+    token is configured.
+
+    Raises:
+        HTTPException: 401 for a missing/wrong token, 403 for a non-local client.
+    """
+    if METRICS_TOKEN:
+        supplied = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {METRICS_TOKEN}".encode("utf-8")):
+            raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    elif request.client is None or request.client.host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Metrics are only served to local clients")
+
+# Prometheus scrape endpoint (DB pool state, request metrics and other registered collectors)
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_access)])
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,220 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# A sample is (name suffix, labels, value); the suffix is "" for plain gauges
+# and counters, or "_bucket" / "_sum" / "_count" for histogram series.
+Sample = Tuple[str, Dict[str, str], float]
+
+# A family is (metric name, type, help text, samples)
+Family = Tuple[str, str, str, List[Sample]]
+
+_collectors: List[Callable[[], Iterable[Family]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[Family]]):
+    """
+    Registers a callable that reports metric families at scrape time.
+
+    Args:
+        collector: Returns (name, type, help, samples) tuples, where type is
+            "gauge", "counter" or "histogram".
+
+    Returns:
+        The collector, so this can be used as a decorator.
+    """
+    _collectors.append(collector)
+    return collector
+
+
+# Caches exported by the cache collector, keyed by their `cache` label
+_caches: Dict[str, object] = {}
+
+
+def register_cache(name: str, cache) -> None:
+    """
+    Exports a cache's stats() (size, maxsize, hits, misses, e.g. a TTLCache)
+    as ttl_cache_* series labelled cache=<name>.
+    """
+    if not _caches:
+        register_collector(_collect_caches)
+    _caches[name] = cache
+
+
+def _collect_caches() -> List[Family]:
+    stats = {name: cache.stats() for name, cache in _caches.items()}
+
+    def samples(key: str) -> List[Sample]:
+        return [("", {"cache": name}, s[key]) for name, s in stats.items()]
+
+    return [
+        ("ttl_cache_hits_total", "counter", "Cache lookups answered from the cache.", samples("hits")),
+        ("ttl_cache_misses_total", "counter", "Cache lookups that missed or found an expired entry.", samples("misses")),
+        ("ttl_cache_size", "gauge", "Entries currently cached.", samples("size")),
+        ("ttl_cache_maxsize", "gauge", "Configured cache capacity.", samples("maxsize")),
+    ]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus() -> str:
+    """
+    Renders every registered collector in the Prometheus text exposition format.
+
+    Returns:
+        str: Scrape body for GET /metrics.
+    """
+    lines: List[str] = []
+    for collector in _collectors:
+        for name, metric_type, help_text, samples in collector():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Latency buckets (seconds) for request and upstream-call histograms
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """
+    Thread-safe counter family keyed by label values.
+
+    Registers itself as a collector, so every counter created at import
+    time shows up on GET /metrics.
+    """
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        register_collector(lambda: [self.collect()])
+
+    def inc(self, *label_values, amount: float = 1):
+        """Adds `amount` to the series identified by `label_values` (in label_names order)."""
+        key = tuple(str(v) for v in label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        """Current value of every series, keyed by label values."""
+        with self._lock:
+            return dict(self._values)
+
+    def collect(self) -> Family:
+        samples = [("", dict(zip(self.label_names, key)), value) for key, value in sorted(self.values().items())]
+        return self.name, "counter", self.help_text, samples
+
+
+class Histogram:
+    """
+    Thread-safe histogram family with fixed upper bounds, keyed by label values.
+
+    Observations are counted per bucket (a bisect and three increments), and
+    only turned into cumulative Prometheus buckets at scrape time.
+    """
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        register_collector(lambda: [self.collect()])
+
+    def observe(self, value: float, *label_values):
+        """Records one observation for the series identified by `label_values`."""
+        key = tuple(str(v) for v in label_values)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        """Copy of every series as (per-bucket counts, sum, count)."""
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+    def quantile(self, q: float, *label_values) -> Optional[float]:
+        """
+        Estimates a quantile from the bucket counts, interpolating linearly
+        inside the bucket that holds it (as Prometheus' histogram_quantile
+        does). Returns None if the series has no observations.
+        """
+        series = self.snapshot().get(tuple(str(v) for v in label_values))
+        if not series or not series[2]:
+            return None
+        counts, _, count = series
+        rank, seen, lower = q * count, 0, 0.0
+        for bound, bucket_count in zip(self.buckets, counts):
+            if bucket_count and seen + bucket_count >= rank:
+                return lower + (bound - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = bound
+        # Beyond the last finite bound: report that bound
+        return self.buckets[-1]
+
+    def collect(self) -> Family:
+        samples: List[Sample] = []
+        for key, (counts, total, count) in sorted(self.snapshot().items()):
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", {**labels, "le": repr(float(bound))}, cumulative))
+            samples.append(("_bucket", {**labels, "le": "+Inf"}, count))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, count))
+        return self.name, "histogram", self.help_text, samples
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Serves render_prometheus() on http://host:port/metrics from a daemon
+    thread, for worker processes that don't run the API (e.g. the refresh
+    daemon).
+
+    Returns:
+        ThreadingHTTPServer: The running server (call shutdown() to stop it).
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes are not worth a log line each
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, String, Float, BigInteger, Index, PrimaryKeyConstraint
+from app.database import Base
+
+class PriceHistory(Base):
+    """
+    SQLAlchemy model for the 'price_history' table.
+    One OHLCV bar per symbol and timestamp, appended on every refresh.
+    """
+    __tablename__ = "price_history"
+
+    # Stock symbol (matches stock_cache.symbol)
+    symbol = Column(String, nullable=False)
+
+    # Bar time as UNIX seconds (integer, so buckets are cheap integer division)
+    ts = Column(BigInteger, nullable=False)
+
+    # Open / high / low / close prices within the bar (a quote snapshot has o = h = l = c)
+    open = Column(Float, nullable=True)
+    high = Column(Float, nullable=True)
+    low = Column(Float, nullable=True)
+    close = Column(Float, nullable=False)
+
+    # Volume traded during this bar, so bucketed queries can sum it
+    volume = Column(BigInteger, nullable=True)
+
+    # Cumulative session volume reported with the quote (used to derive `volume`)
+    session_volume = Column(BigInteger, nullable=True)
+
+    __table_args__ = (
+        # (symbol, ts) key: range queries for one symbol are a single index scan
+        PrimaryKeyConstraint("symbol", "ts"),
+        # Covering index so Postgres can answer range queries with index-only scans
+        Index(
+            "ix_price_history_symbol_ts_covering",
+            "symbol",
+            "ts",
+            postgresql_include=["open", "high", "low", "close", "volume"],
+        ),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Integer
+from sqlalchemy import Column, String, Float, Integer, BigInteger, LargeBinary, Index
 from app.database import Base
 
 class StockCache(Base):
@@ -44,5 +44,29 @@ class StockCache(Base):
     # 52-week low
     low_52w = Column(Float, nullable=True)
 
-    # Historical data stored as comma-separated string (e.g., prices or timestamps)
-    history = Column(String, nullable=True)
+    # Historical prices packed as little-endian float64 (see services/history_codec)
+    history = Column(LargeBinary, nullable=True)
+
+    # UNIX seconds of the last successful quote refresh (drives refresh scheduling)
+    last_updated = Column(BigInteger, nullable=True)
+
+    # UNIX seconds the profile (name, exchange) and metrics (P/E, market cap,
+    # 52-week range) were last fetched; they refresh on slower cadences
+    profile_updated_at = Column(BigInteger, nullable=True)
+    metrics_updated_at = Column(BigInteger, nullable=True)
+
+    __table_args__ = (
+        # Keyset pagination indexes for GET /stocks?sort=... (symbol breaks ties)
+        Index("ix_stock_cache_price_symbol", "price", "symbol"),
+        Index("ix_stock_cache_percent_change_symbol", "percent_change", "symbol"),
+        Index("ix_stock_cache_volume_symbol", "volume", "symbol"),
+        Index("ix_stock_cache_market_cap_symbol", "market_cap", "symbol"),
+        # Descending sorts keep NULLs last, which a backward scan of the
+        # indexes above can't provide on Postgres
+        Index("ix_stock_cache_price_desc", price.desc().nulls_last(), symbol.desc()).ddl_if(dialect="postgresql"),
+        Index("ix_stock_cache_percent_change_desc", percent_change.desc().nulls_last(), symbol.desc()).ddl_if(dialect="postgresql"),
+        Index("ix_stock_cache_volume_desc", volume.desc().nulls_last(), symbol.desc()).ddl_if(dialect="postgresql"),
+        Index("ix_stock_cache_market_cap_desc", market_cap.desc().nulls_last(), symbol.desc()).ddl_if(dialect="postgresql"),
+        # GET /stocks?exchange=...
+        Index("ix_stock_cache_exchange_symbol", "exchange", "symbol"),
+    )
@@ -1,32 +1,242 @@
-from fastapi import APIRouter, Depends
+import json
+import time
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.http_caching import negotiated_response
+from app.metrics import register_cache
 from app.models.stock_cache import StockCache
+from app.schemas.stock import Stock
+from app.serialization import JSON
+from app.services.snapshot_cache import stock_snapshot
+from app.services.price_stream import price_broadcaster
+from app.services.history_service import RESOLUTIONS, query_price_history
+from app.services.downsample import MAX_POINTS, downsample_candles
+from app.services.ttl_cache import TTLCache
+from app.services.stock_formats import STOCK_COLUMNS, render_candles, render_stocks
+from app.services.stock_query import (
+    MAX_PAGE_SIZE,
+    DEFAULT_PAGE_SIZE,
+    StockQueryError,
+    parse_fields,
+    parse_sort,
+    query_stocks,
+)
 
 # Create API router with tag and prefix for all stock-related routes
 router = APIRouter(prefix="/stocks", tags=["Stocks"])
 
-@router.get("/")
-def get_all_cached_stocks(db: Session = Depends(get_db)):
+# Seconds between SSE keep-alive comments on an idle stream
+STREAM_KEEPALIVE_SECONDS = 15
+
+# Default window for history queries without `from`
+DEFAULT_HISTORY_WINDOW_SECONDS = 7 * 86400
+
+# Downsampled history responses keyed by (symbol, from, to, resolution, points)
+history_cache = TTLCache(maxsize=1024, ttl=60)
+register_cache("history", history_cache)
+
+
+def build_stocks_snapshot(db: Session):
     """
-    Fetch all cached stock data from the database.
+    Loads every cached stock and serializes the list to JSON once.
+
+    The Core select's records are kept as-is (history still packed) so the
+    MessagePack and Arrow variants are encoded from the same query result,
+    Arrow column by column without going through per-row dicts.
 
     Args:
+        db (Session): SQLAlchemy session.
+
+    Returns:
+        tuple: (list of records in STOCK_COLUMNS order, JSON-encoded body as bytes)
+    """
+    records = db.execute(select(*StockCache.__table__.columns).order_by(StockCache.symbol)).all()
+    return records, render_stocks(JSON, STOCK_COLUMNS, records)
+
+
+@router.get("/", response_model=List[Stock])
+def get_all_cached_stocks(
+    request: Request,
+    points: Optional[int] = Query(None, ge=3, le=MAX_POINTS, description="Max history points per stock (LTTB)"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (symbol is always included)"),
+    sort: Optional[str] = Query(None, description="price, percent_change, volume or market_cap; prefix '-' for descending"),
+    exchange: Optional[str] = Query(None, description="Only stocks listed on this exchange"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    db: Session = Depends(get_db),
+):
+    """
+    Fetch cached stock data from the database.
+
+    Without query parameters, served from an in-process snapshot that is
+    rebuilt at most once per TTL (or after a refresh commits), so polling
+    clients don't each trigger a table scan.
+
+    With any of fields/sort/exchange/limit/cursor, a single page is read in
+    SQL (selecting only the requested columns) using keyset pagination.
+    The cursor for the following page is returned in the X-Next-Cursor
+    header, which is absent on the last page.
+
+    The body is JSON by default; clients may ask for MessagePack
+    (application/msgpack) or an Arrow IPC stream
+    (application/vnd.apache.arrow.stream) via Accept, and large bodies are
+    brotli/gzip-compressed per Accept-Encoding. Snapshot renderings are
+    built once per format, encoding and point budget.
+
+    Clients that send the response's ETag in If-None-Match get 304 Not
+    Modified instead of the body.
+
+    Args:
+        request (Request): Incoming request (for conditional headers).
+        points (int, optional): History point budget; longer series are
+            downsampled with LTTB (rendered once per snapshot and budget).
+        fields (str, optional): Column projection, e.g. "symbol,price,percent_change".
+        sort (str, optional): Sort key; pages are ordered by symbol otherwise.
+        exchange (str, optional): Exchange filter (e.g. "NASDAQ").
+        limit (int, optional): Page size (default 100 when paginating).
+        cursor (str, optional): Opaque cursor from the previous page.
         db (Session): SQLAlchemy session provided by FastAPI.
 
     Returns:
         List[dict]: List of stocks with enriched information.
+
+    Raises:
+        HTTPException: If a field, sort key or cursor is invalid (400), or
+            no acceptable format can be produced (406).
     """
-    # Query all stock entries from the stock_cache table
-    stocks = db.query(StockCache).all()
+    if fields is None and sort is None and exchange is None and limit is None and cursor is None:
+        snapshot = stock_snapshot.get(lambda: build_stocks_snapshot(db))
+
+        def render(fmt):
+            if fmt == JSON and points is None:
+                return snapshot.body
+            return render_stocks(fmt, STOCK_COLUMNS, snapshot.rows, points)
+
+        def variant(key, build):
+            return snapshot.variant(("points", points) + key, lambda rows: build())
+
+        return negotiated_response(request, render, variant)
+
+    try:
+        columns = parse_fields(fields)
+        sort_column, descending = parse_sort(sort)
+        names, records, next_cursor = query_stocks(
+            db,
+            columns,
+            sort=sort_column,
+            descending=descending,
+            exchange=exchange,
+            limit=limit or DEFAULT_PAGE_SIZE,
+            cursor=cursor,
+        )
+    except StockQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    response = negotiated_response(request, lambda fmt: render_stocks(fmt, names, records, points))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
 
-    # Parse CSV string in `history` into float list
-    for stock in stocks:
+
+@router.get("/stream")
+async def stream_prices(request: Request, symbols: Optional[str] = None):
+    """
+    Server-Sent Events stream of price deltas, pushed as soon as a refresh commits.
+
+    Each `prices` event carries a JSON list of
+    {symbol, price, change, percent_change, volume} objects.
+
+    Args:
+        request (Request): Incoming request (used to detect disconnects).
+        symbols (str, optional): Comma-separated symbols to subscribe to
+            (e.g. the user's watchlist). Omit to receive every symbol.
+
+    Returns:
+        StreamingResponse: A `text/event-stream` response that stays open.
+    """
+    wanted = None
+    if symbols:
+        wanted = {s.strip().upper() for s in symbols.split(",") if s.strip()}
+
+    subscription = price_broadcaster.subscribe(wanted)
+
+    async def events():
         try:
-            stock.history = [float(x) for x in str(stock.history).split(",")] if stock.history else []
-        except (ValueError, TypeError):
-            stock.history = []
+            # Ask EventSource clients to reconnect after 5s if the stream drops
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    deltas = await asyncio.wait_for(subscription.queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: prices\ndata: {json.dumps(deltas, separators=(',', ':'))}\n\n"
+        finally:
+            price_broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{symbol}/history")
+def get_price_history(
+    request: Request,
+    symbol: str,
+    from_: Optional[int] = Query(None, alias="from", description="Range start (UNIX seconds)"),
+    to: Optional[int] = Query(None, description="Range end (UNIX seconds), defaults to now"),
+    resolution: Optional[str] = Query(None, description="1, 5, 15, 30, 60, D or W; omit for raw bars"),
+    points: Optional[int] = Query(None, ge=3, le=MAX_POINTS, description="Max bars to return (LTTB)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Returns OHLCV history for one symbol from the price_history table.
+
+    Negotiates JSON, MessagePack or Arrow IPC (one column per candle field)
+    and compression the same way as GET /stocks.
+
+    Args:
+        request (Request): Incoming request (for Accept / conditional headers).
+        symbol (str): Stock symbol.
+        from_ (int, optional): Range start; defaults to 7 days before `to`.
+        to (int, optional): Range end; defaults to now.
+        resolution (str, optional): Bucket size; omit for the raw stored bars.
+        points (int, optional): Point budget; the series is downsampled with
+            LTTB on close prices. Results are cached briefly per request shape.
+        db (Session): SQLAlchemy session provided by FastAPI.
+
+    Returns:
+        Response: Candle data as parallel lists t/o/h/l/c/v with status "s".
+
+    Raises:
+        HTTPException: If the resolution is unknown or the range is inverted
+            (400), or no acceptable format can be produced (406).
+    """
+    if resolution is not None and resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(RESOLUTIONS)}")
 
+    end = to if to is not None else int(time.time())
+    start = from_ if from_ is not None else end - DEFAULT_HISTORY_WINDOW_SECONDS
+    if start > end:
+        raise HTTPException(status_code=400, detail="`from` must not be after `to`")
 
+    if points is None:
+        payload = {"symbol": symbol, "resolution": resolution, **query_price_history(db, symbol, start, end, resolution)}
+    else:
+        cache_key = (symbol, from_, to, resolution, points)
+        payload = history_cache.get(cache_key)
+        if payload is None:
+            candles = query_price_history(db, symbol, start, end, resolution)
+            payload = {"symbol": symbol, "resolution": resolution, **downsample_candles(candles, points)}
+            history_cache.set(cache_key, payload)
 
-    return stocks
+    return negotiated_response(request, lambda fmt: render_candles(fmt, payload))
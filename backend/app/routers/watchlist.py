@@ -1,12 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, dialect_insert
+from app.http_caching import conditional_response, make_etag
 from app.models.watchlist import Watchlist
 from app.models.user import User
 from app.models.stock_cache import StockCache
 from app.auth import get_current_user
-from app.schemas.watchlist import WatchlistItem 
+from app.schemas.watchlist import WatchlistItem, WatchlistBatch, WatchlistBatchResult
+from app.schemas.stock import Stock
+from app.serialization import dumps
+from app.services.history_codec import decode_history
+from app.services.downsample import MAX_POINTS, downsample_series
+
+logger = logging.getLogger(__name__)
 
 # Initialize the API router for watchlist-related endpoints.
 # All routes here will be prefixed with "/watchlist"
@@ -82,23 +92,141 @@ def remove_from_watchlist(
     return {"message": f"Removed {symbol} from watchlist"}
 
 
+@router.post("/batch", response_model=WatchlistBatchResult)
+def update_watchlist_batch(
+    batch: WatchlistBatch,
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """
+    Adds and removes many watchlist symbols in a single transaction.
+
+    Symbols to add are validated against stock_cache with one IN query,
+    inserted with one INSERT ... ON CONFLICT DO NOTHING and removals are
+    applied with one DELETE ... IN, so the cost doesn't grow with the
+    number of round trips.
+
+    Args:
+        batch (WatchlistBatch): Symbols to add and to remove.
+        db (Session): SQLAlchemy session object.
+        user (User): Authenticated user.
+
+    Returns:
+        WatchlistBatchResult: Symbols actually added/removed, and unknown symbols.
+
+    Raises:
+        HTTPException: If a symbol appears in both lists.
+    """
+    to_add = list(dict.fromkeys(s.strip() for s in batch.add if s.strip()))
+    to_remove = list(dict.fromkeys(s.strip() for s in batch.remove if s.strip()))
+
+    conflicting = set(to_add).intersection(to_remove)
+    if conflicting:
+        raise HTTPException(status_code=400, detail=f"Symbols in both add and remove: {', '.join(sorted(conflicting))}")
+
+    # One IN query to find which of the requested symbols exist
+    known = set()
+    if to_add:
+        known = set(db.scalars(select(StockCache.symbol).where(StockCache.symbol.in_(to_add))))
+    not_found = [s for s in to_add if s not in known]
+
+    added, removed = [], []
+    try:
+        valid = [s for s in to_add if s in known]
+        if valid:
+            insert = dialect_insert(db)
+            stmt = (
+                insert(Watchlist)
+                .values([{"user_id": user.uid, "symbol": s} for s in valid])
+                .on_conflict_do_nothing(index_elements=["user_id", "symbol"])
+                .returning(Watchlist.symbol)
+            )
+            added = list(db.scalars(stmt))
+
+        if to_remove:
+            stmt = (
+                delete(Watchlist)
+                .where(Watchlist.user_id == user.uid, Watchlist.symbol.in_(to_remove))
+                .returning(Watchlist.symbol)
+            )
+            removed = list(db.scalars(stmt))
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {"added": sorted(added), "removed": sorted(removed), "not_found": not_found}
+
+
 @router.get("/", response_model=list[WatchlistItem])
 def get_watchlist(
+    request: Request,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
     """
     Retrieves the user's current watchlist symbols only.
+    Answers 304 Not Modified when the client's If-None-Match still matches.
 
     Args:
+        request (Request): Incoming request (for conditional headers).
         db (Session): SQLAlchemy session object.
         user (User): Authenticated user.
 
     Returns:
         list[WatchlistItem]: List of symbols the user is watching.
     """
-    
-    print("Fetching watchlist for user:", user.uid)
-    # Fetch all watchlist entries for the user
-    entries = db.query(Watchlist).filter_by(user_id=user.uid).all()
-    return entries  # Will be serialized using WatchlistItem schema
+    logger.debug("Fetching watchlist", extra={"user": user.uid})
+    # Fetch all watchlist symbols for the user, in a stable order for the ETag
+    symbols = (
+        db.query(Watchlist.symbol)
+        .filter_by(user_id=user.uid)
+        .order_by(Watchlist.symbol)
+        .all()
+    )
+
+    # Serialized in the WatchlistItem shape
+    body = dumps([{"symbol": s} for (s,) in symbols])
+    return conditional_response(request, body, make_etag(body))
+
+
+@router.get("/stocks", response_model=list[Stock])
+def get_watchlist_stocks(
+    request: Request,
+    points: Optional[int] = Query(None, ge=3, le=MAX_POINTS, description="Max history points per stock (LTTB)"),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user)
+):
+    """
+    Retrieves full stock rows for the user's watchlist in one query.
+
+    Joins watchlist to stock_cache on symbol, filtered by user_id; the
+    (user_id, symbol) primary key serves the filter as an index range scan,
+    so only the watched rows are read and sent.
+
+    Args:
+        request (Request): Incoming request (for conditional headers).
+        points (int, optional): History point budget per stock (LTTB).
+        db (Session): SQLAlchemy session object.
+        user (User): Authenticated user.
+
+    Returns:
+        list[Stock]: Watched stocks with parsed history, ordered by symbol.
+    """
+    stmt = (
+        select(*StockCache.__table__.columns)
+        .join(Watchlist, Watchlist.symbol == StockCache.symbol)
+        .where(Watchlist.user_id == user.uid)
+        .order_by(Watchlist.symbol)
+    )
+
+    rows = []
+    for row in db.execute(stmt).mappings():
+        stock = dict(row)
+        history = decode_history(stock["history"])
+        stock["history"] = downsample_series(history, points) if points else history
+        rows.append(stock)
+
+    body = dumps(rows)
+    return conditional_response(request, body, make_etag(body))
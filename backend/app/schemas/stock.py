@@ -19,6 +19,9 @@ class Stock(BaseModel):
     high_52w: Optional[float]                # 52-week high
     low_52w: Optional[float]                 # 52-week low
     history: List[float]                     # Historical price list (used in chart)
+    last_updated: Optional[int] = None       # UNIX seconds of the last quote refresh
+    profile_updated_at: Optional[int] = None # UNIX seconds of the last profile fetch
+    metrics_updated_at: Optional[int] = None # UNIX seconds of the last metrics fetch
 
     class Config:
         orm_mode = True  # Allows conversion from ORM model to schema using `.from_orm()`
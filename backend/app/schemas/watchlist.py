@@ -1,4 +1,9 @@
-from pydantic import BaseModel
+from typing import List
+from pydantic import BaseModel, Field
+
+# Upper bound on symbols per list in one batch request
+MAX_BATCH_SYMBOLS = 1000
+
 
 class WatchlistItem(BaseModel):
     """
@@ -10,3 +15,21 @@ class WatchlistItem(BaseModel):
 
     class Config:
         orm_mode = True     # Allows conversion from Watchlist ORM model
+
+
+class WatchlistBatch(BaseModel):
+    """
+    Request body for `POST /watchlist/batch`: symbols to add and to remove.
+    """
+    add: List[str] = Field(default_factory=list, max_length=MAX_BATCH_SYMBOLS)
+    remove: List[str] = Field(default_factory=list, max_length=MAX_BATCH_SYMBOLS)
+
+
+class WatchlistBatchResult(BaseModel):
+    """
+    Outcome of a batch update; symbols already in the requested state are
+    listed in neither `added` nor `removed`.
+    """
+    added: List[str]        # Newly watched symbols
+    removed: List[str]      # Symbols that were unwatched
+    not_found: List[str]    # Symbols to add that aren't in stock_cache
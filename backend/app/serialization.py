@@ -0,0 +1,170 @@
+import os
+import gzip
+from typing import List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+# Optional wire formats: endpoints only offer what is installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# Other names clients use for the same formats
+FORMAT_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+
+def dumps(obj) -> bytes:
+    """
+    Serializes a response body to compact JSON bytes with orjson.
+
+    NumPy arrays (e.g. decoded history blobs) are written natively, so rows
+    don't need converting to lists first. NaN/Infinity become null.
+
+    Args:
+        obj: JSON-compatible data (dicts, lists, numbers, strings, ndarrays).
+
+    Returns:
+        bytes: UTF-8 encoded JSON.
+    """
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+def packb(obj) -> bytes:
+    """Serializes to MessagePack; NumPy arrays become arrays of floats."""
+    return msgpack.packb(obj, default=_msgpack_default, use_bin_type=True)
+
+
+def arrow_ipc(table) -> bytes:
+    """Writes a pyarrow Table as an Arrow IPC stream."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def float64_list_array(arrays: List[np.ndarray]):
+    """
+    Builds an Arrow list<float64> column from per-row float64 arrays with a
+    single concatenation: one values buffer plus an offsets buffer.
+    """
+    lengths = np.fromiter((len(a) for a in arrays), dtype=np.int32, count=len(arrays))
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    values = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.float64)
+    return pa.ListArray.from_arrays(pa.array(offsets), pa.array(values, type=pa.float64()))
+
+
+def supported_formats() -> List[str]:
+    """Media types this process can produce, JSON first."""
+    formats = [JSON]
+    if msgpack is not None:
+        formats.append(MSGPACK)
+    if pa is not None:
+        formats.append(ARROW)
+    return formats
+
+
+def _parse_header(header: str) -> List[Tuple[str, float]]:
+    """Splits an Accept / Accept-Encoding header into (value, q) pairs."""
+    parsed = []
+    for part in header.split(","):
+        value, *params = [p.strip() for p in part.split(";")]
+        if not value:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        parsed.append((value.lower(), q))
+    return parsed
+
+
+def negotiate_format(accept: Optional[str]) -> Optional[str]:
+    """
+    Picks the response media type from an Accept header.
+
+    The most specific matching range decides each format's quality; the
+    highest quality wins, with ties going to the client's listed order
+    and then to JSON.
+
+    Args:
+        accept (str, optional): Accept header value.
+
+    Returns:
+        str: One of supported_formats(), or None if none is acceptable.
+    """
+    formats = supported_formats()
+    if not accept:
+        return JSON
+
+    ranges = [(FORMAT_ALIASES.get(value, value), q) for value, q in _parse_header(accept)]
+    best, best_key = None, None
+    for index, fmt in enumerate(formats):
+        kind = fmt.split("/")[0] + "/*"
+        matches = [(3, q, i) for i, (value, q) in enumerate(ranges) if value == fmt]
+        matches += [(2, q, i) for i, (value, q) in enumerate(ranges) if value == kind]
+        matches += [(1, q, i) for i, (value, q) in enumerate(ranges) if value == "*/*"]
+        if not matches:
+            continue
+        _, q, position = max(matches, key=lambda m: m[0])
+        if q <= 0:
+            continue
+        key = (q, -position, -index)
+        if best_key is None or key > best_key:
+            best, best_key = fmt, key
+    return best
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Picks a content coding from Accept-Encoding: brotli when available and
+    accepted, else gzip, else None (identity).
+    """
+    if not accept_encoding:
+        return None
+    accepted = {value: q for value, q in _parse_header(accept_encoding)}
+    wildcard = accepted.get("*", 0.0)
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    """Compresses `body` with the coding chosen by negotiate_encoding()."""
+    if coding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
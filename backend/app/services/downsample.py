@@ -0,0 +1,90 @@
+import numpy as np
+
+# Largest `points=` budget a client may ask for
+MAX_POINTS = 5000
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Picks `n_out` representative points with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; the rest are split into
+    n_out - 2 equal buckets and, walking left to right, each bucket keeps
+    the point forming the largest triangle with the previously kept point
+    and the average of the next bucket. Bucket averages and per-bucket
+    areas are computed with NumPy; only the walk over buckets is a loop.
+
+    Args:
+        x (np.ndarray): Monotonic x values (e.g. timestamps).
+        y (np.ndarray): Values to preserve the shape of (e.g. close prices).
+        n_out (int): Number of points to keep.
+
+    Returns:
+        np.ndarray: Sorted indices into x/y (all indices if no reduction is needed).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket i covers [edges[i], edges[i + 1]) of the interior points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+
+    # The "next bucket" of the final bucket is the last point itself
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    out = np.empty(n_out, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+
+    return out
+
+
+def downsample_series(values, n_out: int) -> list:
+    """
+    LTTB-downsamples an evenly spaced series (e.g. stock_cache.history).
+
+    Args:
+        values (array-like): Series values.
+        n_out (int): Maximum number of points to return.
+
+    Returns:
+        list: The kept values, in order.
+    """
+    y = np.asarray(values, dtype=np.float64)
+    return y[lttb_indices(np.arange(len(y)), y, n_out)].tolist()
+
+
+def downsample_candles(candles: dict, n_out: int) -> dict:
+    """
+    Reduces Finnhub-style candle columns (t/o/h/l/c/v) to at most `n_out` bars.
+    Bars are chosen by LTTB on the close series so the chart shape survives.
+
+    Args:
+        candles (dict): Output of history_service.query_price_history().
+        n_out (int): Point budget.
+
+    Returns:
+        dict: Same layout with every column reduced to the chosen bars.
+    """
+    if len(candles.get("t", [])) <= n_out:
+        return candles
+
+    idx = lttb_indices(np.asarray(candles["t"]), np.asarray(candles["c"]), n_out)
+    reduced = dict(candles)
+    for key in ("t", "o", "h", "l", "c", "v"):
+        column = np.asarray(candles[key], dtype=object)
+        reduced[key] = column[idx].tolist()
+    return reduced
@@ -1,74 +1,350 @@
 import os
-import requests
+import time
+import asyncio
+import logging
+from typing import Dict, List, Mapping, Optional, Sequence, Union
+
+import httpx
 from dotenv import load_dotenv
 
+from app.metrics import Counter, Histogram
+from app.services.rate_limiter import finnhub_limiter
+
+logger = logging.getLogger(__name__)
+
 # Load environment variables from .env file
 load_dotenv()
 
 # Finnhub API configuration
 FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
-BASE_URL = "https://finnhub.io/api/v1"
+BASE_URL = os.getenv("FINNHUB_BASE_URL", "https://finnhub.io/api/v1")
 
-def get_stock_info(symbol: str):
+# HTTP client tuning (seconds / connection counts)
+REQUEST_TIMEOUT = float(os.getenv("FINNHUB_TIMEOUT", "10"))
+MAX_CONNECTIONS = int(os.getenv("FINNHUB_MAX_CONNECTIONS", "20"))
+
+# Maximum number of symbols fetched at the same time during a bulk refresh
+DEFAULT_CONCURRENCY = int(os.getenv("FINNHUB_CONCURRENCY", "8"))
+
+# How many times a rate-limited (429) call is re-queued before giving up
+MAX_RETRIES = int(os.getenv("FINNHUB_MAX_RETRIES", "5"))
+
+# Data categories, each backed by one Finnhub endpoint and refreshed on its own cadence
+QUOTE = "quote"        # /quote: price, change, volume, day range
+PROFILE = "profile"    # /stock/profile2: company name, exchange
+METRICS = "metrics"    # /stock/metric: P/E, market cap, 52-week range
+ALL_PARTS = (QUOTE, PROFILE, METRICS)
+
+# Upstream call metrics, labelled by endpoint path (/quote, /stock/profile2, /stock/metric)
+finnhub_request_duration = Histogram(
+    "finnhub_request_duration_seconds", "Finnhub HTTP request latency by endpoint.", ("endpoint",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+finnhub_responses_total = Counter(
+    "finnhub_responses_total", "Finnhub responses by endpoint and status code (\"error\" for transport failures).",
+    ("endpoint", "status"),
+)
+finnhub_response_bytes_total = Counter(
+    "finnhub_response_bytes_total", "Finnhub response body bytes by endpoint.", ("endpoint",),
+)
+finnhub_retries_total = Counter(
+    "finnhub_retries_total", "Finnhub calls re-queued after a 429.", ("endpoint",),
+)
+finnhub_rate_limit_wait_seconds_total = Counter(
+    "finnhub_rate_limit_wait_seconds_total", "Time calls spent waiting on the shared rate limiter.", ("endpoint",),
+)
+
+
+def create_client() -> httpx.AsyncClient:
     """
-    Fetches real-time and fundamental stock data for a given symbol from Finnhub.
+    Creates a pooled async HTTP client for Finnhub.
+
+    The client keeps connections alive between requests, so a batch of
+    symbols reuses the same handful of TCP/TLS connections.
+
+    Returns:
+        httpx.AsyncClient: Client bound to the Finnhub base URL.
+    """
+    return httpx.AsyncClient(
+        base_url=BASE_URL,
+        timeout=REQUEST_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_CONNECTIONS,
+        ),
+    )
+
+
+async def _get_json(client: httpx.AsyncClient, path: str, params: dict) -> dict:
+    """
+    Performs a single GET against the Finnhub API and decodes the JSON body.
+
+    Every call first takes a token from the shared rate limiter. A 429 from
+    Finnhub drains the bucket for the advertised Retry-After period and the
+    call is queued again rather than surfacing as empty data.
+
+    Latency, status, body size, retries and limiter waits are recorded per
+    endpoint (see call_summary()).
+
+    Raises:
+        httpx.HTTPStatusError: If the call is still rate limited after
+            MAX_RETRIES attempts, or fails with another HTTP error.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        waited = await finnhub_limiter.acquire()
+        if waited:
+            finnhub_rate_limit_wait_seconds_total.inc(path, amount=waited)
+
+        start = time.perf_counter()
+        try:
+            resp = await client.get(path, params={**params, "token": FINNHUB_API_KEY})
+        except httpx.HTTPError:
+            finnhub_request_duration.observe(time.perf_counter() - start, path)
+            finnhub_responses_total.inc(path, "error")
+            raise
+        finnhub_request_duration.observe(time.perf_counter() - start, path)
+        finnhub_responses_total.inc(path, resp.status_code)
+        finnhub_response_bytes_total.inc(path, amount=len(resp.content))
+
+        if resp.status_code == 429 and attempt < MAX_RETRIES:
+            finnhub_retries_total.inc(path)
+            retry_after = resp.headers.get("Retry-After")
+            try:
+                backoff = float(retry_after) if retry_after else 2.0 ** attempt
+            except ValueError:
+                backoff = 2.0 ** attempt
+            logger.warning("Finnhub rate limit hit on %s; retrying in %.1fs", path, backoff)
+            await finnhub_limiter.penalize(backoff)
+            continue
+
+        resp.raise_for_status()
+        data = resp.json()
+        return data if isinstance(data, dict) else {}
+
+
+async def fetch_stock_info(
+    symbol: str,
+    client: httpx.AsyncClient,
+    parts: Sequence[str] = ALL_PARTS,
+) -> Optional[Dict]:
+    """
+    Fetches the requested data categories for one symbol concurrently.
+
+    Only the endpoints for `parts` are called, so a quote-only refresh costs
+    a single request. Fields of categories that were not fetched are left
+    out of the result (the cache upsert then keeps the stored values).
 
     Args:
         symbol (str): Ticker symbol of the stock (e.g., "AAPL").
+        client (httpx.AsyncClient): Pooled client from create_client().
+        parts (Sequence[str]): Any of QUOTE, PROFILE and METRICS.
 
     Returns:
         dict: A dictionary with enriched stock details for the frontend/API,
+              including "parts" (the categories actually fetched),
               or None if the fetch failed.
     """
+    endpoints = {
+        QUOTE: ("/quote", {"symbol": symbol}),
+        PROFILE: ("/stock/profile2", {"symbol": symbol}),
+        METRICS: ("/stock/metric", {"symbol": symbol, "metric": "all"}),
+    }
+    wanted = [part for part in ALL_PARTS if part in parts]
+
     try:
-        # Construct API endpoints for different data types
-        quote_url = f"{BASE_URL}/quote"
-        profile_url = f"{BASE_URL}/stock/profile2"
-        metrics_url = f"{BASE_URL}/stock/metric"
+        # Fire the sub-requests at once; metrics failures are tolerated
+        responses = await asyncio.gather(
+            *(_get_json(client, *endpoints[part]) for part in wanted),
+            return_exceptions=True,
+        )
+        results = dict(zip(wanted, responses))
 
-        # Request live market quote
-        quote_resp = requests.get(quote_url, params={"symbol": symbol, "token": FINNHUB_API_KEY})
-        quote_data = quote_resp.json()
+        for part in (QUOTE, PROFILE):
+            if isinstance(results.get(part), Exception):
+                raise results[part]
 
-        # Request company profile info (name, exchange, etc.)
-        profile_resp = requests.get(profile_url, params={"symbol": symbol, "token": FINNHUB_API_KEY})
-        profile_data = profile_resp.json()
+        if isinstance(results.get(METRICS), Exception):
+            logger.warning("Metrics fetch failed for %s: %s", symbol, results[METRICS])
+            del results[METRICS]
 
-        # Attempt to fetch financial metrics (P/E, market cap, 52-week high/low)
-        try:
-            metrics_resp = requests.get(metrics_url, params={"symbol": symbol, "metric": "all", "token": FINNHUB_API_KEY})
-            metrics_data = metrics_resp.json().get("metric", {})
-        except Exception as me:
-            print(f"[WARN] Metrics fetch failed for {symbol}: {me}")
-            metrics_data = {}
-
-        # Handle bad quote data fallback
-        if not quote_data or "c" not in quote_data or quote_data.get("c") == 0:
-            print(f"[WARN] Incomplete quote data for {symbol}. Proceeding with defaults. Raw: {quote_data}")
-            quote_data = {"c": 0, "d": None, "dp": None, "v": 0}
-
-        # Consolidate response dictionary
-        return {
-            "symbol": symbol,
-            "full_name": profile_data.get("name", symbol),
-            "name": profile_data.get("name"),
-            "exchange": profile_data.get("exchange"),
-            "price": quote_data.get("c", 0),
-            "change": quote_data.get("d"),
-            "percent_change": quote_data.get("dp"),
-            "volume": quote_data.get("v", 0),
-            "pe_ratio": metrics_data.get("peNormalizedAnnual"),
-            "market_cap": metrics_data.get("marketCapitalization"),
-            "high_52w": metrics_data.get("52WeekHigh"),
-            "low_52w": metrics_data.get("52WeekLow"),
-            "history": [  # Simulated history values for sparkline chart
-                quote_data.get("c", 0) * 0.97,
-                quote_data.get("c", 0) * 0.99,
-                quote_data.get("c", 0) * 1.01,
-                quote_data.get("c", 0)
-            ]
-        }
+        info = {"symbol": symbol, "parts": tuple(results)}
+
+        if PROFILE in results:
+            profile_data = results[PROFILE]
+            info.update(
+                full_name=profile_data.get("name", symbol),
+                name=profile_data.get("name"),
+                exchange=profile_data.get("exchange"),
+            )
+
+        if QUOTE in results:
+            quote_data = results[QUOTE]
+
+            # Handle bad quote data fallback
+            if not quote_data or "c" not in quote_data or quote_data.get("c") == 0:
+                logger.warning("Incomplete quote data for %s; proceeding with defaults. Raw: %s", symbol, quote_data)
+                quote_data = {"c": 0, "d": None, "dp": None, "v": 0}
+
+            info.update(
+                price=quote_data.get("c", 0),
+                change=quote_data.get("d"),
+                percent_change=quote_data.get("dp"),
+                volume=quote_data.get("v", 0),
+                open=quote_data.get("o"),            # Session open / high / low so far
+                high=quote_data.get("h"),
+                low=quote_data.get("l"),
+                prev_close=quote_data.get("pc"),
+                quote_time=quote_data.get("t"),      # UNIX seconds of the quote
+            )
+
+        if METRICS in results:
+            metrics_data = results[METRICS].get("metric") or {}
+            info.update(
+                pe_ratio=metrics_data.get("peNormalizedAnnual"),
+                market_cap=metrics_data.get("marketCapitalization"),
+                high_52w=metrics_data.get("52WeekHigh"),
+                low_52w=metrics_data.get("52WeekLow"),
+            )
+
+        return info
 
     except Exception as e:
-        print(f"[ERROR] Finnhub fetch failed for {symbol}: {e}")
+        logger.error("Finnhub fetch failed for %s: %s", symbol, e)
         return None
+
+
+async def fetch_stock_infos(
+    symbols: List[str],
+    client: Optional[httpx.AsyncClient] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    parts: Union[Sequence[str], Mapping[str, Sequence[str]]] = ALL_PARTS,
+) -> Dict[str, Optional[Dict]]:
+    """
+    Fetches many symbols at once with a bounded number in flight.
+
+    Args:
+        symbols (List[str]): Ticker symbols to fetch.
+        client (httpx.AsyncClient, optional): Shared client; a temporary one
+            is created (and closed) when omitted.
+        concurrency (int): Maximum number of symbols fetched simultaneously.
+        parts: Categories to fetch for every symbol, or a mapping of
+            symbol -> categories (symbols missing from it get ALL_PARTS).
+
+    Returns:
+        Dict[str, Optional[dict]]: Stock info per symbol (None on failure),
+        in the same order as the input list.
+    """
+    if client is None:
+        async with create_client() as own_client:
+            return await fetch_stock_infos(symbols, own_client, concurrency, parts)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    def parts_for(symbol: str) -> Sequence[str]:
+        if isinstance(parts, Mapping):
+            return parts.get(symbol, ALL_PARTS)
+        return parts
+
+    async def fetch_one(symbol: str):
+        async with semaphore:
+            return await fetch_stock_info(symbol, client, parts_for(symbol))
+
+    results = await asyncio.gather(*(fetch_one(s) for s in symbols))
+    return dict(zip(symbols, results))
+
+
+def get_stock_infos(
+    symbols: List[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    parts: Union[Sequence[str], Mapping[str, Sequence[str]]] = ALL_PARTS,
+) -> Dict[str, Optional[Dict]]:
+    """
+    Synchronous entry point for bulk fetches, for scripts and worker threads only.
+
+    Runs its own event loop, so it cannot be called from a coroutine (an
+    async FastAPI handler, the refresh scheduler); await fetch_stock_infos()
+    there instead.
+
+    Args:
+        symbols (List[str]): Ticker symbols to fetch.
+        concurrency (int): Maximum number of symbols fetched simultaneously.
+        parts: Categories for every symbol, or symbol -> categories
+            (see stock_service.due_parts()).
+
+    Returns:
+        Dict[str, Optional[dict]]: Stock info per symbol (None on failure).
+
+    Raises:
+        RuntimeError: If called while an event loop is running in this thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(fetch_stock_infos(symbols, concurrency=concurrency, parts=parts))
+    raise RuntimeError(
+        "get_stock_infos() / get_stock_info() can't run inside an event loop; "
+        "await fetch_stock_infos() or fetch_stock_info() instead"
+    )
+
+
+def get_stock_info(symbol: str):
+    """
+    Fetches real-time and fundamental stock data for a given symbol from Finnhub.
+    Synchronous like get_stock_infos(), so not callable from a running event loop.
+
+    Args:
+        symbol (str): Ticker symbol of the stock (e.g., "AAPL").
+
+    Returns:
+        dict: A dictionary with enriched stock details for the frontend/API,
+              or None if the fetch failed.
+    """
+    return get_stock_infos([symbol])[symbol]
+
+
+def call_summary() -> Dict[str, Dict]:
+    """
+    Per-endpoint totals of the Finnhub calls made by this process.
+
+    Returns:
+        Dict[str, dict]: endpoint -> {calls, seconds, p50, p99 (estimated
+        from the latency histogram), statuses {code: count}, bytes, retries,
+        rate_limit_wait}.
+    """
+    statuses = finnhub_responses_total.values()
+    sizes = finnhub_response_bytes_total.values()
+    retries = finnhub_retries_total.values()
+    waits = finnhub_rate_limit_wait_seconds_total.values()
+
+    summary = {}
+    for (endpoint,), (_, seconds, calls) in sorted(finnhub_request_duration.snapshot().items()):
+        summary[endpoint] = {
+            "calls": calls,
+            "seconds": seconds,
+            "p50": finnhub_request_duration.quantile(0.5, endpoint),
+            "p99": finnhub_request_duration.quantile(0.99, endpoint),
+            "statuses": {status: int(n) for (path, status), n in sorted(statuses.items()) if path == endpoint},
+            "bytes": int(sizes.get((endpoint,), 0)),
+            "retries": int(retries.get((endpoint,), 0)),
+            "rate_limit_wait": waits.get((endpoint,), 0.0),
+        }
+    return summary
+
+
+def format_call_summary(summary: Optional[Dict[str, Dict]] = None) -> str:
+    """
+    Renders call_summary() as a small table for the refresh scripts' output.
+    """
+    summary = call_summary() if summary is None else summary
+    if not summary:
+        return "No Finnhub calls made."
+
+    lines = [f"{'endpoint':<16} {'calls':>6} {'p50 ms':>8} {'p99 ms':>8} {'total s':>8} "
+             f"{'KiB':>8} {'retries':>7} {'limiter s':>9}  statuses"]
+    for endpoint, s in summary.items():
+        statuses = ", ".join(f"{status}: {n}" for status, n in s["statuses"].items())
+        lines.append(
+            f"{endpoint:<16} {s['calls']:>6} {s['p50'] * 1000:>8.0f} {s['p99'] * 1000:>8.0f} {s['seconds']:>8.1f} "
+            f"{s['bytes'] / 1024:>8.1f} {s['retries']:>7} {s['rate_limit_wait']:>9.1f}  {statuses}"
+        )
+    return "\n".join(lines)
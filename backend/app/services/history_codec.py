@@ -0,0 +1,37 @@
+from typing import Iterable, Optional
+
+import numpy as np
+
+# History points are stored as little-endian float64, back to back
+HISTORY_DTYPE = np.dtype("<f8")
+
+
+def encode_history(values: Iterable[float]) -> bytes:
+    """
+    Packs a sequence of prices into the binary stock_cache.history format.
+
+    Args:
+        values (Iterable[float]): Price points, oldest first.
+
+    Returns:
+        bytes: 8 bytes per point.
+    """
+    return np.asarray(list(values), dtype=HISTORY_DTYPE).tobytes()
+
+
+def decode_history(blob: Optional[bytes]) -> np.ndarray:
+    """
+    Unpacks a stored history blob into a float64 array.
+
+    The array is a zero-copy, read-only view over the blob (bytes or the
+    memoryview psycopg2 returns for bytea); call .tolist() for JSON.
+
+    Args:
+        blob (bytes | memoryview | None): Value of stock_cache.history.
+
+    Returns:
+        np.ndarray: 1-D float64 array (empty when there is no history).
+    """
+    if not blob:
+        return np.empty(0, dtype=HISTORY_DTYPE)
+    return np.frombuffer(blob, dtype=HISTORY_DTYPE)
@@ -0,0 +1,103 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import BigInteger, and_, cast, func, select
+from sqlalchemy.orm import Session, aliased
+
+from app.models.price_history import PriceHistory
+
+# Finnhub-style candle resolutions -> bucket width in seconds.
+# Buckets are aligned to the UNIX epoch (UTC days; weeks start on Thursdays).
+RESOLUTIONS = {
+    "1": 60,
+    "5": 300,
+    "15": 900,
+    "30": 1800,
+    "60": 3600,
+    "D": 86400,
+    "W": 604800,
+}
+
+CANDLE_KEYS = ("t", "o", "h", "l", "c", "v")
+
+
+def query_price_history(
+    db: Session,
+    symbol: str,
+    start: int,
+    end: int,
+    resolution: Optional[str] = None,
+) -> Dict[str, List]:
+    """
+    Reads OHLCV bars for one symbol between two UNIX timestamps (inclusive).
+
+    Both forms are a single range scan on the (symbol, ts) key. With a
+    resolution, bars are aggregated in SQL: high/low/volume via max/min/sum
+    (bars store the volume traded within them), open/close from the
+    first/last bar of each bucket (looked up by key).
+
+    Args:
+        db (Session): SQLAlchemy DB session.
+        symbol (str): Stock symbol.
+        start (int): Range start, UNIX seconds.
+        end (int): Range end, UNIX seconds.
+        resolution (str, optional): Key of RESOLUTIONS; None returns raw bars.
+
+    Returns:
+        dict: Finnhub candle format - parallel lists t/o/h/l/c/v plus status "s"
+              ("ok" or "no_data").
+    """
+    in_range = and_(PriceHistory.symbol == symbol, PriceHistory.ts >= start, PriceHistory.ts <= end)
+
+    if resolution is None:
+        stmt = (
+            select(PriceHistory.ts, PriceHistory.open, PriceHistory.high,
+                   PriceHistory.low, PriceHistory.close, PriceHistory.volume)
+            .where(in_range)
+            .order_by(PriceHistory.ts)
+        )
+    else:
+        step = RESOLUTIONS[resolution]
+        bucket = ((PriceHistory.ts // step) * step).label("bucket")
+        buckets = (
+            select(
+                bucket,
+                func.min(PriceHistory.ts).label("first_ts"),
+                func.max(PriceHistory.ts).label("last_ts"),
+                func.max(PriceHistory.high).label("high"),
+                func.min(PriceHistory.low).label("low"),
+                # SUM(bigint) is numeric on Postgres; keep it an integer
+                cast(func.sum(PriceHistory.volume), BigInteger).label("volume"),
+            )
+            .where(in_range)
+            .group_by(bucket)
+            .subquery()
+        )
+        first_bar = aliased(PriceHistory)
+        last_bar = aliased(PriceHistory)
+        stmt = (
+            select(buckets.c.bucket, first_bar.open, buckets.c.high,
+                   buckets.c.low, last_bar.close, buckets.c.volume)
+            .join(first_bar, and_(first_bar.symbol == symbol, first_bar.ts == buckets.c.first_ts))
+            .join(last_bar, and_(last_bar.symbol == symbol, last_bar.ts == buckets.c.last_ts))
+            .order_by(buckets.c.bucket)
+        )
+
+    return rows_to_candles(db.execute(stmt).all())
+
+
+def rows_to_candles(rows) -> Dict[str, List]:
+    """
+    Transposes (t, o, h, l, c, v) rows into Finnhub candle format.
+
+    Timestamps and volumes are coerced to int and prices to float, so
+    driver-specific numeric types (e.g. Decimal from Postgres aggregates)
+    never reach the JSON / MessagePack / Arrow encoders.
+    """
+    if not rows:
+        return {"s": "no_data", **{key: [] for key in CANDLE_KEYS}}
+
+    t, o, h, l, c, v = zip(*rows)
+    as_int = lambda values: [None if x is None else int(x) for x in values]
+    as_float = lambda values: [None if x is None else float(x) for x in values]
+    columns = [as_int(t), as_float(o), as_float(h), as_float(l), as_float(c), as_int(v)]
+    return {"s": "ok", **dict(zip(CANDLE_KEYS, columns))}
@@ -0,0 +1,180 @@
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, FrozenSet, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+# Seconds after the close during which quotes keep refreshing, so the final
+# post-close snapshot carries the settled closing price
+POST_CLOSE_GRACE_SECONDS = int(os.getenv("POST_CLOSE_GRACE_SECONDS", "300"))
+
+
+def _dates(year: int, *month_days: str) -> FrozenSet[date]:
+    return frozenset(date(year, *map(int, md.split("-"))) for md in month_days)
+
+
+@dataclass(frozen=True)
+class Market:
+    """
+    Regular trading session and holiday table for one exchange group.
+
+    Holidays are only bundled for the years listed; other years fall back
+    to weekends-only closures.
+    """
+    code: str
+    tz: ZoneInfo
+    open_time: time
+    close_time: time
+    holidays: FrozenSet[date] = frozenset()
+    early_closes: Dict[date, time] = field(default_factory=dict)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays
+
+    def session(self, day: date) -> Optional[Tuple[datetime, datetime]]:
+        """
+        Returns (open, close) as timezone-aware datetimes, or None if the market is closed that day.
+        """
+        if not self.is_trading_day(day):
+            return None
+        close_time = self.early_closes.get(day, self.close_time)
+        return (
+            datetime.combine(day, self.open_time, tzinfo=self.tz),
+            datetime.combine(day, close_time, tzinfo=self.tz),
+        )
+
+    def is_open(self, at: datetime) -> bool:
+        """True during a regular session (open inclusive, close exclusive)."""
+        local = at.astimezone(self.tz)
+        session = self.session(local.date())
+        return session is not None and session[0] <= local < session[1]
+
+    def last_close(self, at: datetime) -> Optional[datetime]:
+        """
+        The most recent session close at or before `at`, looking back up to two weeks.
+        """
+        local = at.astimezone(self.tz)
+        for back in range(15):
+            session = self.session(local.date() - timedelta(days=back))
+            if session is not None and session[1] <= local:
+                return session[1]
+        return None
+
+
+US_EQUITIES = Market(
+    code="US",
+    tz=ZoneInfo("America/New_York"),
+    open_time=time(9, 30),
+    close_time=time(16, 0),
+    holidays=(
+        _dates(2025, "01-01", "01-09", "01-20", "02-17", "04-18", "05-26", "06-19", "07-04", "09-01", "11-27", "12-25")
+        | _dates(2026, "01-01", "01-19", "02-16", "04-03", "05-25", "06-19", "07-03", "09-07", "11-26", "12-25")
+        | _dates(2027, "01-01", "01-18", "02-15", "03-26", "05-31", "06-18", "07-05", "09-06", "11-25", "12-24")
+    ),
+    early_closes={
+        day: time(13, 0)
+        for day in _dates(2025, "07-03", "11-28", "12-24") | _dates(2026, "11-27", "12-24") | _dates(2027, "11-26")
+    },
+)
+
+INDIA_EQUITIES = Market(
+    code="IN",
+    tz=ZoneInfo("Asia/Kolkata"),
+    open_time=time(9, 15),
+    close_time=time(15, 30),
+    holidays=(
+        _dates(
+            2025, "02-26", "03-14", "03-31", "04-10", "04-14", "04-18", "05-01",
+            "08-15", "08-27", "10-02", "10-21", "10-22", "11-05", "12-25",
+        )
+        | _dates(
+            2026, "01-26", "03-03", "03-26", "03-31", "04-03", "04-14", "05-01", "05-28",
+            "06-26", "09-14", "10-02", "10-20", "11-10", "11-24", "12-25",
+        )
+        # Provisional: NSE publishes its 2027 list each December; until then only the
+        # fixed-date holidays and Good Friday are known (lunar-calendar ones still missing)
+        | _dates(2027, "01-26", "03-26", "04-14")
+    ),
+)
+
+# Substrings of stock_cache.exchange (as reported by Finnhub's profile2) per market
+EXCHANGE_KEYWORDS = (
+    ("NASDAQ", US_EQUITIES),
+    ("NEW YORK STOCK EXCHANGE", US_EQUITIES),
+    ("NYSE", US_EQUITIES),
+    ("CBOE", US_EQUITIES),
+    ("NATIONAL STOCK EXCHANGE OF INDIA", INDIA_EQUITIES),
+    ("NSE", INDIA_EQUITIES),
+    ("BSE", INDIA_EQUITIES),
+)
+
+# Keywords match as whole words, so e.g. "HANSEATISCHE ..." isn't taken for NSE
+_EXCHANGE_PATTERNS = tuple((re.compile(rf"\b{re.escape(keyword)}\b"), market) for keyword, market in EXCHANGE_KEYWORDS)
+
+
+def market_for(exchange: Optional[str]) -> Optional[Market]:
+    """
+    Maps a stored exchange name (e.g. "NASDAQ NMS - GLOBAL MARKET") to its Market.
+
+    Returns:
+        Market: The matching calendar, or None for unknown exchanges.
+    """
+    if not exchange:
+        return None
+    name = exchange.upper()
+    for pattern, market in _EXCHANGE_PATTERNS:
+        if pattern.search(name):
+            return market
+    return None
+
+
+def should_refresh(exchange: Optional[str], last_updated: Optional[float], now: Optional[float] = None) -> bool:
+    """
+    Decides whether refreshing a symbol's quote can yield new data.
+
+    Quotes refresh during the session and for POST_CLOSE_GRACE_SECONDS after
+    it. Once that window has passed, one more (post-close) snapshot is taken
+    if the last refresh predates its end; after that the symbol is skipped
+    until the next session. Unknown exchanges are always refreshed.
+
+    Args:
+        exchange (str, optional): stock_cache.exchange value.
+        last_updated (float, optional): UNIX seconds of the last quote refresh.
+        now (float, optional): Current UNIX time (defaults to the clock).
+
+    Returns:
+        bool: True if the symbol should be refreshed now.
+    """
+    market = market_for(exchange)
+    if market is None:
+        return True
+
+    at = datetime.fromtimestamp(now, timezone.utc) if now is not None else datetime.now(timezone.utc)
+    if market.is_open(at):
+        return True
+
+    close = market.last_close(at)
+    if close is None:
+        return True
+
+    settled = close.timestamp() + POST_CLOSE_GRACE_SECONDS
+    if at.timestamp() < settled:
+        return True
+    return not last_updated or last_updated < settled
+
+
+def trading_date(exchange: Optional[str], at: float) -> date:
+    """
+    The date `at` falls on in the exchange's timezone (UTC for unknown
+    exchanges). It changes overnight, between one session's close and the
+    next session's open.
+    """
+    market = market_for(exchange)
+    return datetime.fromtimestamp(at, market.tz if market else timezone.utc).date()
+
+
+def in_session(exchange: Optional[str], at: float) -> bool:
+    """True during the exchange's regular session; always True for unknown exchanges."""
+    market = market_for(exchange)
+    return market is None or market.is_open(datetime.fromtimestamp(at, timezone.utc))
@@ -0,0 +1,243 @@
+import os
+import json
+import logging
+import asyncio
+from typing import Dict, Iterable, List, Optional, Set
+
+from dotenv import load_dotenv
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.services.snapshot_cache import stock_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Fields pushed to streaming clients for each refreshed symbol
+STREAM_FIELDS = ("price", "change", "percent_change", "volume")
+
+# Postgres channel carrying committed deltas from refresh processes to API workers
+NOTIFY_CHANNEL = "stock_updates"
+
+# pg_notify payloads must stay below 8000 bytes
+NOTIFY_MAX_BYTES = 7000
+
+# Batches buffered per connection before the oldest is dropped for a slow client
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("PRICE_STREAM_QUEUE_SIZE", "32"))
+
+# Session.info key for deltas waiting on a commit (non-Postgres databases)
+_PENDING_KEY = "pending_price_deltas"
+
+
+class Subscription:
+    """
+    One streaming client: an optional symbol filter plus a bounded queue
+    of delta batches waiting to be written to the connection.
+    """
+
+    def __init__(self, symbols: Optional[Set[str]] = None):
+        self.symbols = symbols
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, deltas: List[Dict]):
+        """
+        Queues the deltas this subscription cares about. A client that is too
+        slow to keep up loses its oldest batch rather than blocking others.
+        """
+        if self.symbols is not None:
+            deltas = [d for d in deltas if d["symbol"] in self.symbols]
+        if not deltas:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(deltas)
+
+
+class PriceBroadcaster:
+    """
+    Fans out committed price deltas to every connected subscriber.
+
+    All subscriber bookkeeping happens on the event loop; publish() may be
+    called from any thread and hands the batch over to the loop.
+    """
+
+    def __init__(self):
+        self._subscribers: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Attaches the broadcaster to the application's event loop."""
+        self._loop = loop
+
+    def subscribe(self, symbols: Optional[Set[str]] = None) -> Subscription:
+        subscription = Subscription(symbols)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, deltas: List[Dict]):
+        """
+        Delivers a batch of deltas to all matching subscribers.
+        A no-op in processes that never bound a loop (e.g. refresh scripts).
+        """
+        loop = self._loop
+        if not deltas or loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._dispatch(deltas)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, deltas)
+
+    def _dispatch(self, deltas: List[Dict]):
+        for subscription in list(self._subscribers):
+            subscription.offer(deltas)
+
+
+# Process-wide broadcaster used by the /stocks/stream endpoint
+price_broadcaster = PriceBroadcaster()
+
+
+def to_delta(row: Dict) -> Dict:
+    """Picks the streamed fields out of a stock_cache row."""
+    return {"symbol": row["symbol"], **{f: row.get(f) for f in STREAM_FIELDS}}
+
+
+def _payload_chunks(deltas: List[Dict]) -> Iterable[str]:
+    chunk: List[Dict] = []
+    size = 2
+    for delta in deltas:
+        encoded = len(json.dumps(delta)) + 1
+        if chunk and size + encoded > NOTIFY_MAX_BYTES:
+            yield json.dumps(chunk)
+            chunk, size = [], 2
+        chunk.append(delta)
+        size += encoded
+    if chunk:
+        yield json.dumps(chunk)
+
+
+def queue_price_deltas(db: Session, deltas: List[Dict]):
+    """
+    Schedules deltas to be broadcast once the session's transaction commits.
+
+    On Postgres the deltas are sent with pg_notify, which the server only
+    delivers on commit, so every API worker listening on NOTIFY_CHANNEL
+    receives them no matter which process ran the refresh. Other databases
+    hold them on the session and publish in-process after commit.
+
+    Args:
+        db (Session): Session whose transaction wrote the rows.
+        deltas (List[dict]): Output of to_delta() for each written row.
+    """
+    if not deltas:
+        return
+
+    if db.get_bind().dialect.name == "postgresql":
+        for payload in _payload_chunks(deltas):
+            db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": payload})
+    else:
+        db.info.setdefault(_PENDING_KEY, []).extend(deltas)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_deltas(session: Session):
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if deltas:
+        stock_snapshot.invalidate()
+        price_broadcaster.publish(deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_deltas(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+class NotifyListener:
+    """
+    Relays Postgres NOTIFY messages on NOTIFY_CHANNEL into the broadcaster.
+
+    Every notify means another process committed a refresh, so it also
+    drops the GET /stocks snapshot; the next request rebuilds it instead of
+    serving the old body (and ETag) until the TTL lapses.
+
+    Uses a dedicated connection (detached from the pool) whose socket is
+    watched by the event loop, so no thread sits blocked waiting for events.
+    """
+
+    def __init__(self, engine, broadcaster: PriceBroadcaster):
+        self.engine = engine
+        self.broadcaster = broadcaster
+        self._conn = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped = False
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        if self.engine.dialect.name != "postgresql":
+            return
+        self._loop = loop
+        self._connect()
+
+    def _connect(self):
+        if self._stopped:
+            return
+        try:
+            pooled = self.engine.raw_connection()
+            pooled.detach()
+            conn = pooled.driver_connection
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            self._conn = conn
+            self._loop.add_reader(conn.fileno(), self._on_readable)
+        except Exception as e:
+            logger.warning("Price stream listener failed to connect: %s; retrying in 5s", e)
+            self._loop.call_later(5, self._connect)
+
+    def _on_readable(self):
+        conn = self._conn
+        try:
+            conn.poll()
+        except Exception as e:
+            logger.warning("Price stream listener lost its connection: %s", e)
+            self._drop_connection()
+            self._loop.call_later(5, self._connect)
+            return
+
+        if conn.notifies:
+            stock_snapshot.invalidate()
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            try:
+                self.broadcaster.publish(json.loads(notify.payload))
+            except ValueError:
+                continue
+
+    def _drop_connection(self):
+        if self._conn is None:
+            return
+        try:
+            self._loop.remove_reader(self._conn.fileno())
+        except Exception:
+            pass
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def stop(self):
+        self._stopped = True
+        if self._loop is not None:
+            self._drop_connection()
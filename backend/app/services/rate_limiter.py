@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from typing import Optional
+
+try:
+    import fcntl  # POSIX only; falls back to process-local limiting elsewhere
+except ImportError:  # pragma: no cover - Windows dev machines
+    fcntl = None
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Finnhub free tier allows 60 calls/minute; burst caps how many can go out back-to-back
+# (an empty value means the default)
+RATE_PER_MINUTE = float(os.getenv("FINNHUB_RATE_PER_MINUTE") or "60")
+BURST = float(os.getenv("FINNHUB_RATE_BURST") or "10")
+
+# Bucket state shared between processes on the same machine (scripts, API workers)
+STATE_FILE = os.getenv(
+    "FINNHUB_RATE_STATE_FILE",
+    os.path.join(tempfile.gettempdir(), "marketmuse_finnhub_bucket.json"),
+)
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter whose state lives in a lock-protected file.
+
+    Every process that points at the same state file draws from one shared
+    bucket, so concurrent refresh scripts and API workers together never
+    exceed the configured rate. Callers that find the bucket empty sleep
+    until the next token is due instead of failing.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: float, state_file: Optional[str] = None):
+        """
+        Args:
+            rate_per_minute (float): Sustained calls per minute; must be positive.
+            burst (float): Calls allowed back-to-back (at least 1).
+            state_file (str, optional): Shared state path; process-local if omitted.
+
+        Raises:
+            ValueError: If rate_per_minute is not positive (e.g. FINNHUB_RATE_PER_MINUTE=0).
+        """
+        if not rate_per_minute > 0:
+            raise ValueError(
+                f"Finnhub rate must be a positive number of calls per minute, got {rate_per_minute!r} "
+                "(check FINNHUB_RATE_PER_MINUTE)"
+            )
+        self.rate = rate_per_minute / 60.0  # tokens per second
+        self.burst = max(1.0, burst)
+        self.state_file = state_file
+        self._thread_lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.time()
+
+    def _take(self) -> float:
+        """
+        Tries to take one token.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available.
+        """
+        with self._thread_lock:
+            if self.state_file and fcntl:
+                with open(self.state_file, "a+") as fh:
+                    fcntl.flock(fh, fcntl.LOCK_EX)
+                    try:
+                        fh.seek(0)
+                        try:
+                            state = json.loads(fh.read() or "{}")
+                        except ValueError:
+                            state = {}
+                        tokens = float(state.get("tokens", self.burst))
+                        updated = float(state.get("updated", time.time()))
+
+                        wait, tokens, updated = self._refill_and_take(tokens, updated)
+
+                        fh.seek(0)
+                        fh.truncate()
+                        fh.write(json.dumps({"tokens": tokens, "updated": updated}))
+                        fh.flush()
+                    finally:
+                        fcntl.flock(fh, fcntl.LOCK_UN)
+                return wait
+
+            wait, self._tokens, self._updated = self._refill_and_take(self._tokens, self._updated)
+            return wait
+
+    def _refill_and_take(self, tokens: float, updated: float):
+        now = time.time()
+        tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+        if tokens >= 1:
+            return 0.0, tokens - 1, now
+        return (1 - tokens) / self.rate, tokens, now
+
+    async def acquire(self) -> float:
+        """
+        Waits until a token is available and takes it.
+
+        Returns:
+            float: Total seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            # File locking blocks, so keep it off the event loop
+            wait = await asyncio.to_thread(self._take)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    async def penalize(self, seconds: float):
+        """
+        Drains the bucket so that no caller is let through for `seconds`.
+        Used when Finnhub answers 429 despite local limiting (e.g. another host).
+        """
+        # File locking blocks, so keep it off the event loop
+        await asyncio.to_thread(self._drain, seconds)
+
+    def _drain(self, seconds: float):
+        with self._thread_lock:
+            deficit = seconds * self.rate
+            if self.state_file and fcntl:
+                with open(self.state_file, "a+") as fh:
+                    fcntl.flock(fh, fcntl.LOCK_EX)
+                    try:
+                        fh.seek(0)
+                        fh.truncate()
+                        fh.write(json.dumps({"tokens": -deficit, "updated": time.time()}))
+                        fh.flush()
+                    finally:
+                        fcntl.flock(fh, fcntl.LOCK_UN)
+            else:
+                self._tokens = -deficit
+                self._updated = time.time()
+
+
+# Shared limiter for every Finnhub call made from this process
+finnhub_limiter = TokenBucket(RATE_PER_MINUTE, BURST, STATE_FILE)
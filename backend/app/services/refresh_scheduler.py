@@ -0,0 +1,293 @@
+import os
+import time
+import heapq
+import signal
+import logging
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import desc, func, select
+
+from app.database import SessionLocal
+from app.models.stock_cache import StockCache
+from app.models.watchlist import Watchlist
+from app.models.refresh_log_model import RefreshLog
+from app.services.finnhub_service import (
+    ALL_PARTS,
+    DEFAULT_CONCURRENCY,
+    METRICS,
+    PROFILE,
+    QUOTE,
+    create_client,
+    fetch_stock_infos,
+)
+from app.services.market_calendar import should_refresh
+from app.services.snapshot_cache import stock_snapshot
+from app.services.stock_service import (
+    METRICS_TTL_SECONDS,
+    PROFILE_TTL_SECONDS,
+    parts_due_at,
+    save_stock_infos,
+)
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Symbols fetched and written together in one scheduling round
+REFRESH_BATCH_SIZE = int(os.getenv("REFRESH_BATCH_SIZE", "20"))
+
+# Per-category freshness: a symbol becomes due once its quote is older than
+# QUOTE_TTL_SECONDS; profile and metrics ride along only once their own TTL lapses
+# (PROFILE_TTL_SECONDS / METRICS_TTL_SECONDS live in stock_service, shared with get_stock_data)
+QUOTE_TTL_SECONDS = float(os.getenv("QUOTE_TTL_SECONDS", "60"))
+
+# Sleep between rounds when nothing is due
+REFRESH_IDLE_SECONDS = float(os.getenv("REFRESH_IDLE_SECONDS", "5"))
+
+# How often the daemon reloads symbols and watcher counts from the DB
+REFRESH_RELOAD_SECONDS = float(os.getenv("REFRESH_RELOAD_SECONDS", "300"))
+
+# refresh_log rows kept after trimming (at least one batch's worth, see _trim_log)
+REFRESH_LOG_KEEP = 10
+
+
+def trim_refresh_log(db, keep_last_n: int = REFRESH_LOG_KEEP):
+    """
+    Keep only the most recent N refresh_log entries.
+    Deletes older rows to avoid memory bloat.
+    """
+    ids_to_keep = (
+        db.query(RefreshLog.id)
+        .order_by(desc(RefreshLog.refreshed_at))
+        .limit(keep_last_n)
+        .all()
+    )
+    if ids_to_keep:
+        keep_ids = [r.id for r in ids_to_keep]
+        db.query(RefreshLog).filter(~RefreshLog.id.in_(keep_ids)).delete(synchronize_session=False)
+        db.commit()
+
+
+class RefreshScheduler:
+    """
+    Keeps stock_cache fresh by always refreshing the most urgent symbols first.
+
+    A symbol's priority is its quote staleness (seconds since the last
+    refresh or attempt) multiplied by (1 + number of users watching it), so
+    watched symbols are revisited proportionally more often and nothing
+    starves. Each round takes the top REFRESH_BATCH_SIZE symbols off that
+    priority queue, fetches them with `concurrency` workers sharing one HTTP
+    client (the shared token bucket keeps the whole process within the
+    Finnhub budget) and writes them in one transaction.
+
+    Only the quote is fetched on every round; profile and metrics are added
+    for a symbol when their own TTL has lapsed, so a typical refresh costs
+    one API call per symbol. Symbols whose exchange is closed are skipped
+    once their post-close snapshot is stored (see market_calendar).
+    """
+
+    def __init__(
+        self,
+        batch_size: int = REFRESH_BATCH_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        quote_ttl: float = QUOTE_TTL_SECONDS,
+        profile_ttl: float = PROFILE_TTL_SECONDS,
+        metrics_ttl: float = METRICS_TTL_SECONDS,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.quote_ttl = quote_ttl
+        self.ttls = {PROFILE: profile_ttl, METRICS: metrics_ttl}
+        self.last_refreshed: Dict[str, float] = {}
+        self.fundamentals: Dict[str, Dict[str, float]] = {}
+        self.watchers: Dict[str, int] = {}
+        self.exchanges: Dict[str, Optional[str]] = {}
+        self.loaded_at = 0.0
+        self._stopping = asyncio.Event()
+
+    def load(self):
+        """
+        Loads every cached symbol with its exchange, per-category fetch times
+        and watcher count (one aggregate query over stock_cache LEFT JOIN watchlist).
+        """
+        columns = (
+            StockCache.exchange,
+            StockCache.last_updated,
+            StockCache.profile_updated_at,
+            StockCache.metrics_updated_at,
+        )
+        stmt = (
+            select(StockCache.symbol, *columns, func.count(Watchlist.user_id))
+            .outerjoin(Watchlist, Watchlist.symbol == StockCache.symbol)
+            .group_by(StockCache.symbol, *columns)
+        )
+        db = SessionLocal()
+        try:
+            rows = db.execute(stmt).all()
+        finally:
+            db.close()
+
+        last_refreshed, fundamentals, watchers, exchanges = {}, {}, {}, {}
+        for symbol, exchange, last_updated, profile_at, metrics_at, count in rows:
+            # Keep attempts made since the DB value was written (e.g. failed fetches)
+            last_refreshed[symbol] = max(last_updated or 0, self.last_refreshed.get(symbol, 0))
+            known = self.fundamentals.get(symbol, {})
+            fundamentals[symbol] = {
+                PROFILE: max(profile_at or 0, known.get(PROFILE, 0)),
+                METRICS: max(metrics_at or 0, known.get(METRICS, 0)),
+            }
+            watchers[symbol] = count
+            exchanges[symbol] = exchange
+        self.last_refreshed, self.fundamentals, self.watchers = last_refreshed, fundamentals, watchers
+        self.exchanges = exchanges
+        self.loaded_at = time.time()
+
+    def priority(self, symbol: str, now: float) -> float:
+        """Staleness in seconds weighted by (1 + watcher count)."""
+        staleness = now - self.last_refreshed.get(symbol, 0)
+        return staleness * (1 + self.watchers.get(symbol, 0))
+
+    def parts_due(self, symbol: str, now: float) -> Tuple[str, ...]:
+        """The quote plus any fundamentals category whose TTL has lapsed."""
+        return parts_due_at(self.fundamentals.get(symbol, {}), now, self.ttls)
+
+    def next_batch(self, limit: Optional[int] = None) -> List[str]:
+        """
+        Pops the highest-priority symbols whose quote is older than `quote_ttl`
+        and whose market is open or still owes its post-close snapshot.
+
+        Args:
+            limit (int, optional): Batch size; defaults to self.batch_size.
+
+        Returns:
+            List[str]: Symbols to refresh, most urgent first.
+        """
+        now = time.time()
+        due = [
+            (self.priority(symbol, now), symbol)
+            for symbol, refreshed in self.last_refreshed.items()
+            if now - refreshed >= self.quote_ttl and should_refresh(self.exchanges.get(symbol), refreshed, now)
+        ]
+        return [symbol for _, symbol in heapq.nlargest(limit or self.batch_size, due)]
+
+    def _write(self, symbols: List[str], fetched: Dict[str, Optional[Dict]]):
+        """Stores one round's results and its refresh_log entries in one transaction."""
+        infos = [fetched[s] for s in symbols if fetched.get(s)]
+        db = SessionLocal()
+        try:
+            save_stock_infos(db, infos)
+            for symbol in symbols:
+                status = "success" if fetched.get(symbol) else "error: fetch failed"
+                db.add(RefreshLog(symbol=symbol, status=status))
+            db.commit()
+            stock_snapshot.invalidate()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def refresh(self, symbols: List[str], client) -> int:
+        """
+        Fetches and stores one batch of symbols.
+
+        Args:
+            symbols (List[str]): Symbols from next_batch().
+            client (httpx.AsyncClient): Shared Finnhub client.
+
+        Returns:
+            int: Number of symbols refreshed successfully.
+        """
+        if not symbols:
+            return 0
+
+        now = time.time()
+        parts = {symbol: self.parts_due(symbol, now) for symbol in symbols}
+        fetched = await fetch_stock_infos(symbols, client, self.concurrency, parts)
+
+        # Failed symbols count as attempted so they rejoin the back of the queue
+        now = time.time()
+        for symbol in symbols:
+            self.last_refreshed[symbol] = now
+            info = fetched.get(symbol)
+            for part in info.get("parts", ALL_PARTS) if info else ():
+                if part != QUOTE:
+                    self.fundamentals.setdefault(symbol, {})[part] = now
+
+        await asyncio.to_thread(self._write, symbols, fetched)
+        ok = sum(1 for s in symbols if fetched.get(s))
+        calls = sum(len(p) for p in parts.values())
+        logger.info("Refreshed %d/%d symbols (%d API calls): %s", ok, len(symbols), calls, ", ".join(symbols))
+        return ok
+
+    async def run_once(self, limit: Optional[int] = None) -> int:
+        """
+        One-shot mode: refreshes the `limit` most urgent symbols and exits.
+
+        Returns:
+            int: Number of symbols refreshed successfully.
+        """
+        await asyncio.to_thread(self.load)
+        symbols = self.next_batch(limit)
+        if not symbols:
+            logger.warning("No symbols due for refresh in stock_cache")
+            return 0
+
+        async with create_client() as client:
+            ok = await self.refresh(symbols, client)
+        await asyncio.to_thread(self._trim_log, len(symbols))
+        return ok
+
+    async def run_forever(self):
+        """
+        Daemon mode: keeps refreshing until stop() is called (or SIGINT/SIGTERM).
+        A batch already in flight is finished and committed before exiting.
+        """
+        self._install_signal_handlers()
+        logger.info("Refresh daemon started (batch=%d, workers=%d)", self.batch_size, self.concurrency)
+
+        async with create_client() as client:
+            while not self._stopping.is_set():
+                try:
+                    if time.time() - self.loaded_at >= REFRESH_RELOAD_SECONDS:
+                        await asyncio.to_thread(self.load)
+                        await asyncio.to_thread(self._trim_log)
+
+                    symbols = self.next_batch()
+                    if symbols:
+                        await self.refresh(symbols, client)
+                        continue
+                except Exception as e:
+                    logger.exception("Refresh round failed: %s", e)
+
+                # Nothing due (or the round failed): wait, but wake up at once on shutdown
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), REFRESH_IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+        logger.info("Refresh daemon stopped")
+
+    def stop(self):
+        """Asks run_forever() to exit after the current batch."""
+        self._stopping.set()
+
+    def _install_signal_handlers(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Not supported on this platform / not the main thread
+                pass
+
+    def _trim_log(self, batch: int = 0):
+        """Trims refresh_log, always keeping every entry of the latest batch."""
+        db = SessionLocal()
+        try:
+            trim_refresh_log(db, max(REFRESH_LOG_KEEP, self.batch_size, batch))
+        finally:
+            db.close()
@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+from app.http_caching import make_etag
+
+# Load environment variables from .env file
+load_dotenv()
+
+# How long a built /stocks snapshot may be served before it is rebuilt (seconds)
+STOCKS_SNAPSHOT_TTL = float(os.getenv("STOCKS_SNAPSHOT_TTL", "30"))
+
+
+@dataclass
+class Snapshot:
+    """
+    One immutable build of a cached response.
+
+    Attributes:
+        rows: Query result records the body was rendered from (history
+            still packed), reused to render other formats.
+        body: The rows serialized once as a JSON byte string.
+        etag: Content hash of `body`, used for conditional GETs.
+        built_at: time.monotonic() when the snapshot was built.
+    """
+    rows: Sequence[Any]
+    body: bytes
+    etag: str = ""
+    built_at: float = field(default_factory=time.monotonic)
+    variants: Dict[Hashable, Tuple[bytes, str]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not self.etag:
+            self.etag = make_etag(self.body)
+
+    def variant(self, key: Hashable, render: Callable[[Sequence[Any]], bytes]) -> Tuple[bytes, str]:
+        """
+        Returns an alternative rendering of this snapshot's rows (another
+        format, a compressed body or downsampled history), building and memoizing it on first use. Variants
+        are discarded together with the snapshot.
+
+        Args:
+            key: Identifies the rendering (e.g. ("points", 50)).
+            render: Callable turning the rows into a serialized body.
+
+        Returns:
+            tuple: (body, etag)
+        """
+        cached = self.variants.get(key)
+        if cached is None:
+            body = render(self.rows)
+            cached = self.variants.setdefault(key, (body, make_etag(body)))
+        return cached
+
+
+class SnapshotCache:
+    """
+    Read-through cache holding a single pre-serialized snapshot.
+
+    The snapshot is rebuilt when its TTL lapses or after invalidate().
+    Rebuilds are single-flight: concurrent callers that find the snapshot
+    stale wait on one lock, and only the first of them runs the builder.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._snapshot: Optional[Snapshot] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _fresh(self) -> Optional[Snapshot]:
+        snapshot = self._snapshot
+        if snapshot and time.monotonic() - snapshot.built_at < self.ttl:
+            return snapshot
+        return None
+
+    def get(self, builder: Callable[[], Tuple[Sequence[Any], bytes]]) -> Snapshot:
+        """
+        Returns the current snapshot, building it with `builder` if needed.
+
+        Args:
+            builder: Callable returning (rows, serialized body).
+
+        Returns:
+            Snapshot: A snapshot no older than the TTL.
+        """
+        snapshot = self._fresh()
+        if snapshot:
+            return snapshot
+
+        with self._lock:
+            # Another thread may have rebuilt it while we waited
+            snapshot = self._fresh()
+            if snapshot:
+                return snapshot
+
+            generation = self._generation
+            rows, body = builder()
+            snapshot = Snapshot(rows=rows, body=body)
+
+            # Don't cache a build that raced with an invalidation
+            if generation == self._generation:
+                self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        """
+        Drops the current snapshot so the next request rebuilds it.
+        """
+        self._generation += 1
+        self._snapshot = None
+
+
+# Snapshot behind GET /stocks; invalidated whenever a refresh commits price changes:
+# in-process by price_stream's after_commit hook, and for refreshes run by other
+# processes (cron scripts, scheduler, trade ingestor) by its Postgres NOTIFY listener.
+stock_snapshot = SnapshotCache(STOCKS_SNAPSHOT_TTL)
@@ -0,0 +1,118 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import Float, Integer
+
+from app.models.stock_cache import StockCache
+from app.serialization import ARROW, MSGPACK, arrow_ipc, dumps, float64_list_array, packb, pa
+from app.services.downsample import downsample_series
+from app.services.history_codec import decode_history
+
+# stock_cache column names in table order (the shape of GET /stocks rows)
+STOCK_COLUMNS = [column.name for column in StockCache.__table__.columns]
+
+
+def _arrow_type(column):
+    if column.name == "history":
+        return pa.list_(pa.float64())
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    return pa.string()
+
+
+def _history(blob: Optional[bytes], points: Optional[int]) -> np.ndarray:
+    values = decode_history(blob)
+    if points:
+        return np.asarray(downsample_series(values, points), dtype=np.float64)
+    return values
+
+
+def stock_dicts(names: Sequence[str], records: Sequence[Sequence], points: Optional[int] = None) -> List[Dict]:
+    """
+    Turns query records into API rows with history unpacked.
+
+    Args:
+        names (Sequence[str]): Column name for each record position.
+        records (Sequence[Sequence]): Rows as returned by the query; history
+            (if selected) is still the packed blob.
+        points (int, optional): LTTB point budget for history.
+
+    Returns:
+        List[dict]: One dict per record.
+    """
+    history_at = names.index("history") if "history" in names else None
+    rows = []
+    for record in records:
+        row = dict(zip(names, record))
+        if history_at is not None:
+            row["history"] = _history(record[history_at], points)
+        rows.append(row)
+    return rows
+
+
+def stocks_table(names: Sequence[str], records: Sequence[Sequence], points: Optional[int] = None):
+    """
+    Builds a columnar Arrow table straight from query records.
+
+    Each column is transposed out of the records in one pass; history blobs
+    are unpacked into one list<float64> column (a single values buffer plus
+    offsets), never going through per-row dicts.
+    """
+    columns = StockCache.__table__.columns
+    values_by_column = list(zip(*records)) if records else [()] * len(names)
+
+    arrays = []
+    for name, values in zip(names, values_by_column):
+        if name == "history":
+            arrays.append(float64_list_array([_history(blob, points) for blob in values]))
+        else:
+            arrays.append(pa.array(values, type=_arrow_type(columns[name])))
+    return pa.Table.from_arrays(arrays, names=list(names))
+
+
+def render_stocks(fmt: str, names: Sequence[str], records: Sequence[Sequence], points: Optional[int] = None) -> bytes:
+    """
+    Serializes stock records as JSON, MessagePack or Arrow IPC.
+
+    Args:
+        fmt (str): Media type from serialization.negotiate_format().
+        names (Sequence[str]): Column name for each record position.
+        records (Sequence[Sequence]): Query rows (history still packed).
+        points (int, optional): LTTB point budget for history.
+
+    Returns:
+        bytes: The encoded body.
+    """
+    if fmt == ARROW:
+        return arrow_ipc(stocks_table(names, records, points))
+    rows = stock_dicts(names, records, points)
+    return packb(rows) if fmt == MSGPACK else dumps(rows)
+
+
+def render_candles(fmt: str, payload: Dict) -> bytes:
+    """
+    Serializes a history response ({symbol, resolution, s, t, o, h, l, c, v}).
+
+    Arrow bodies carry the candle lists as columns, with symbol, resolution
+    and status in the schema metadata.
+    """
+    if fmt == ARROW:
+        table = pa.table(
+            {
+                "t": pa.array(payload["t"], type=pa.int64()),
+                "o": pa.array(payload["o"], type=pa.float64()),
+                "h": pa.array(payload["h"], type=pa.float64()),
+                "l": pa.array(payload["l"], type=pa.float64()),
+                "c": pa.array(payload["c"], type=pa.float64()),
+                "v": pa.array(payload["v"], type=pa.int64()),
+            },
+            metadata={
+                "symbol": payload["symbol"],
+                "resolution": payload["resolution"] or "",
+                "s": payload["s"],
+            },
+        )
+        return arrow_ipc(table)
+    return packb(payload) if fmt == MSGPACK else dumps(payload)
@@ -0,0 +1,178 @@
+import json
+import base64
+import binascii
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.stock_cache import StockCache
+
+# Columns a client may sort by (each backed by a (column, symbol) index)
+SORTABLE_FIELDS = ("price", "percent_change", "volume", "market_cap")
+
+# Columns a client may project with `fields=`
+SELECTABLE_FIELDS = tuple(c.name for c in StockCache.__table__.columns)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class StockQueryError(ValueError):
+    """Raised for an unknown field, sort key or a malformed cursor."""
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """
+    Validates a comma-separated `fields=` value.
+
+    Args:
+        fields (str, optional): e.g. "symbol,price,percent_change". Omit for all columns.
+
+    Returns:
+        List[str]: Column names in table order, always including `symbol`.
+
+    Raises:
+        StockQueryError: If a name is not a stock_cache column.
+    """
+    if not fields:
+        return list(SELECTABLE_FIELDS)
+
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted.difference(SELECTABLE_FIELDS)
+    if unknown:
+        raise StockQueryError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+
+    wanted.add("symbol")
+    return [name for name in SELECTABLE_FIELDS if name in wanted]
+
+
+def parse_sort(sort: Optional[str]) -> Tuple[Optional[str], bool]:
+    """
+    Parses `sort=` ("price" ascending, "-price" descending).
+
+    Returns:
+        tuple: (column name or None for symbol order, descending flag)
+
+    Raises:
+        StockQueryError: If the column is not sortable.
+    """
+    if not sort:
+        return None, False
+
+    descending = sort.startswith("-")
+    column = sort.lstrip("-+")
+    if column not in SORTABLE_FIELDS:
+        raise StockQueryError(f"sort must be one of {', '.join(SORTABLE_FIELDS)} (prefix '-' for descending)")
+    return column, descending
+
+
+def encode_cursor(sort_value, symbol: str) -> str:
+    """Opaque, URL-safe cursor pointing just past (sort_value, symbol)."""
+    raw = json.dumps([sort_value, symbol], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[float], str]:
+    """
+    Reverses encode_cursor().
+
+    Raises:
+        StockQueryError: If the cursor was not produced by encode_cursor().
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, symbol = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError, binascii.Error):
+        raise StockQueryError("Invalid cursor")
+    if not isinstance(symbol, str) or not (sort_value is None or isinstance(sort_value, (int, float))):
+        raise StockQueryError("Invalid cursor")
+    return sort_value, symbol
+
+
+def _after_cursor(column, descending: bool, sort_value, symbol: str):
+    """
+    Keyset predicate for rows that come after (sort_value, symbol) in
+    `column ASC|DESC NULLS LAST, symbol ASC|DESC` order.
+    """
+    key = StockCache.symbol
+    if column is None:
+        return key > symbol
+
+    past_symbol = key < symbol if descending else key > symbol
+    if sort_value is None:
+        # Already inside the NULL tail, which is ordered by symbol alone
+        return and_(column.is_(None), past_symbol)
+
+    past_value = column < sort_value if descending else column > sort_value
+    return or_(past_value, and_(column == sort_value, past_symbol), column.is_(None))
+
+
+def query_stocks(
+    db: Session,
+    fields: Sequence[str],
+    sort: Optional[str] = None,
+    descending: bool = False,
+    exchange: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> Tuple[List[str], List[Tuple], Optional[str]]:
+    """
+    Reads one page of stock_cache using keyset pagination.
+
+    Only the requested columns are selected; filtering, ordering and paging
+    all happen in SQL, so each page is a single index range scan. Records
+    are returned as tuples (history still packed) for stock_formats to encode.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        fields (Sequence[str]): Columns to return (from parse_fields()).
+        sort (str, optional): Sort column from parse_sort(); None orders by symbol.
+        descending (bool): Sort direction for `sort`.
+        exchange (str, optional): Only return stocks listed on this exchange.
+        limit (int): Page size.
+        cursor (str, optional): `next_cursor` from the previous page.
+
+    Returns:
+        tuple: (column names, records, next cursor or None on the last page)
+
+    Raises:
+        StockQueryError: If the cursor is malformed.
+    """
+    table = StockCache.__table__
+    sort_column = table.c[sort] if sort else None
+
+    # The cursor needs the sort key even when the client did not ask for it
+    selected = list(fields)
+    if sort and sort not in selected:
+        selected.append(sort)
+
+    stmt = select(*(table.c[name] for name in selected))
+    if exchange:
+        stmt = stmt.where(table.c.exchange == exchange)
+    if cursor:
+        sort_value, symbol = decode_cursor(cursor)
+        stmt = stmt.where(_after_cursor(sort_column, descending, sort_value, symbol))
+
+    if sort_column is None:
+        stmt = stmt.order_by(table.c.symbol)
+    elif descending:
+        stmt = stmt.order_by(sort_column.desc().nulls_last(), table.c.symbol.desc())
+    else:
+        stmt = stmt.order_by(sort_column.asc().nulls_last(), table.c.symbol)
+
+    # Fetch one extra row to learn whether another page exists
+    result = db.execute(stmt.limit(limit + 1)).all()
+    has_more = len(result) > limit
+    records = result[:limit]
+
+    next_cursor = None
+    if has_more and records:
+        last = records[-1]
+        sort_value = last[selected.index(sort)] if sort else None
+        next_cursor = encode_cursor(sort_value, last[selected.index("symbol")])
+
+    # Drop the sort key again if it was only selected for the cursor
+    names = list(fields)
+    records = [tuple(record[:len(names)]) for record in records]
+    return names, records, next_cursor
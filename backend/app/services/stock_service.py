@@ -1,12 +1,91 @@
-from typing import List
+import os
+import time
+import logging
+from typing import Dict, Iterator, List, Literal, Mapping, Optional, Tuple
+from sqlalchemy import and_, func, select
 from sqlalchemy.orm import Session
-from app.services.finnhub_service import get_stock_info
+from app.database import dialect_insert
+from app.services.finnhub_service import ALL_PARTS, METRICS, PROFILE, QUOTE, get_stock_infos
+from app.services.snapshot_cache import stock_snapshot
+from app.services.price_stream import STREAM_FIELDS, queue_price_deltas, to_delta
+from app.services.history_codec import encode_history, decode_history
 from app.models.stock_cache import StockCache
+from app.models.price_history import PriceHistory
+
+logger = logging.getLogger(__name__)
+
+# Number of rows sent per multi-row INSERT ... ON CONFLICT statement
+UPSERT_CHUNK_SIZE = int(os.getenv("UPSERT_CHUNK_SIZE", "500"))
+
+# Merge rules applied when a symbol already exists in the cache:
+# - text fields keep the old value when the new one is null or empty
+# - numeric fields keep the old value when the new one is null or zero
+# - change fields keep the old value only when the new one is null
+# - freshness timestamps advance only for the categories that were fetched
+TEXT_KEEP_OLD = ("full_name", "name", "exchange")
+NUMBER_KEEP_OLD = ("price", "volume", "pe_ratio", "market_cap", "high_52w", "low_52w")
+NULL_KEEP_OLD = ("change", "percent_change", "history", "last_updated", "profile_updated_at", "metrics_updated_at")
+
+# Column recording when each Finnhub data category was last fetched
+FRESHNESS_COLUMNS = {QUOTE: "last_updated", PROFILE: "profile_updated_at", METRICS: "metrics_updated_at"}
+
+# Profile and metrics are refetched only once older than these (seconds)
+PROFILE_TTL_SECONDS = float(os.getenv("PROFILE_TTL_SECONDS", "86400"))
+METRICS_TTL_SECONDS = float(os.getenv("METRICS_TTL_SECONDS", "86400"))
+
+# stock_cache.history (the sparkline series) holds this many recent price_history closes...
+HISTORY_POINTS = int(os.getenv("STOCK_HISTORY_POINTS", "120"))
+
+# ...taken from at most this far back, which bounds the range scan per symbol
+HISTORY_WINDOW_SECONDS = int(os.getenv("STOCK_HISTORY_WINDOW_SECONDS", str(30 * 86400)))
+
+
+def parts_due_at(
+    fetched_at: Mapping[str, Optional[float]],
+    now: float,
+    ttls: Optional[Mapping[str, float]] = None,
+) -> Tuple[str, ...]:
+    """
+    The quote plus every fundamentals category whose TTL has lapsed.
+
+    Args:
+        fetched_at: PROFILE / METRICS -> UNIX seconds of the last fetch (None if never).
+        now (float): Current UNIX time.
+        ttls: Per-category TTLs; defaults to PROFILE_TTL_SECONDS / METRICS_TTL_SECONDS.
+
+    Returns:
+        tuple: Categories to request from finnhub_service.
+    """
+    ttls = ttls or {PROFILE: PROFILE_TTL_SECONDS, METRICS: METRICS_TTL_SECONDS}
+    return (QUOTE,) + tuple(part for part, ttl in ttls.items() if now - (fetched_at.get(part) or 0) >= ttl)
+
+
+def due_parts(db: Session, symbols: List[str], chunk_size: int = UPSERT_CHUNK_SIZE) -> Dict[str, Tuple[str, ...]]:
+    """
+    Works out which categories each symbol needs, from its stored freshness columns.
+
+    Symbols not yet in stock_cache need everything.
+
+    Returns:
+        Dict[str, tuple]: symbol -> categories, usable as fetch_stock_infos(parts=...).
+    """
+    now = time.time()
+    due = {symbol: ALL_PARTS for symbol in symbols}
+    chunk_size = max(1, chunk_size)
+    for start in range(0, len(symbols), chunk_size):
+        stmt = select(StockCache.symbol, StockCache.profile_updated_at, StockCache.metrics_updated_at).where(
+            StockCache.symbol.in_(symbols[start:start + chunk_size])
+        )
+        for symbol, profile_at, metrics_at in db.execute(stmt):
+            due[symbol] = parts_due_at({PROFILE: profile_at, METRICS: metrics_at}, now)
+    return due
+
 
 def sanitize_history_list(raw_history):
     """
     Ensures history is a clean list of floats.
     Strips out any malformed braces or non-numeric entries.
+    Used to clean incoming data before it is packed with encode_history().
     """
     clean = []
 
@@ -27,81 +106,349 @@ def sanitize_history_list(raw_history):
     return clean
 
 
-def get_stock_data(symbols: List[str], db: Session) -> List[StockCache]:
+def build_cache_row(info: Dict) -> Dict:
     """
-    Fetches live stock data for a list of symbols from Finnhub,
-    updates or inserts them into the local database, and returns
-    the entire stock cache.
+    Converts a Finnhub info dict into a stock_cache row ready for upsert.
+
+    Args:
+        info (dict): Output of finnhub_service.get_stock_info().
+
+    Returns:
+        dict: Column name -> value for every stock_cache column.
+    """
+    # Sanitize and pack history as float64 bytes
+    clean_history = sanitize_history_list(info.get("history", []))
+
+    # Stamp only the categories present in this fetch; the rest keep their stored time
+    now = int(time.time())
+    fetched_parts = info.get("parts", ALL_PARTS)
+    freshness = {col: (now if part in fetched_parts else None) for part, col in FRESHNESS_COLUMNS.items()}
+
+    return {
+        "symbol": info["symbol"],
+        "full_name": info.get("full_name"),
+        "name": info.get("name"),
+        "exchange": info.get("exchange"),
+        "price": info.get("price") or 0,
+        "change": info.get("change"),
+        "percent_change": info.get("percent_change"),
+        "volume": info.get("volume"),
+        "pe_ratio": info.get("pe_ratio"),
+        "market_cap": info.get("market_cap"),
+        "high_52w": info.get("high_52w"),
+        "low_52w": info.get("low_52w"),
+        "history": encode_history(clean_history) if "history" in info else None,
+        **freshness,
+    }
+
+
+def upsert_stock_rows(
+    db: Session,
+    rows: List[Dict],
+    chunk_size: int = UPSERT_CHUNK_SIZE,
+    returning: bool = False,
+) -> List[Dict]:
+    """
+    Inserts or merges stock_cache rows with one multi-row
+    INSERT ... ON CONFLICT (symbol) DO UPDATE per chunk.
+
+    Does not commit; the caller owns the transaction. The merged price
+    fields are queued for the live price stream and go out on commit.
 
     Args:
-        symbols (List[str]): List of stock ticker symbols (e.g., ["AAPL", "TSLA"]).
         db (Session): SQLAlchemy DB session.
+        rows (List[dict]): Rows produced by build_cache_row().
+        chunk_size (int): Maximum number of rows per statement.
+        returning (bool): If True, return the merged rows via RETURNING.
 
     Returns:
-        List[StockCache]: Updated list of all cached stock entries.
+        List[dict]: The merged rows when `returning` is set, else an empty list.
     """
-    results = []
+    # A statement may touch each key only once, so collapse duplicates (last wins)
+    unique = list({row["symbol"]: row for row in rows}.values())
+    touched: List[Dict] = []
+    if not unique:
+        return touched
 
-    for symbol in symbols:
-        try:
-            # Get enriched stock data from Finnhub
-            info = get_stock_info(symbol)
-
-            if info:
-                # Sanitize and convert history to CSV string
-                raw_history = info.get("history", [])
-                clean_history = sanitize_history_list(raw_history)
-                history_str = ",".join(str(p) for p in clean_history)
-
-                # Final brace cleaner to guarantee safe storage
-                history_str = history_str.replace("{", "").replace("}", "")
-
-                # Check if symbol already exists in the cache
-                existing = db.query(StockCache).filter_by(symbol=symbol).first()
-
-                if existing:
-                    # Update only if new values are present
-                    existing.full_name = info["full_name"] or existing.full_name
-                    existing.name = info["name"] or existing.name
-                    existing.exchange = info["exchange"] or existing.exchange
-                    existing.price = info["price"] or existing.price
-                    existing.change = info["change"] if info["change"] is not None else existing.change
-                    existing.percent_change = info["percent_change"] if info["percent_change"] is not None else existing.percent_change
-                    existing.volume = info["volume"] or existing.volume
-                    existing.pe_ratio = info["pe_ratio"] or existing.pe_ratio
-                    existing.market_cap = info["market_cap"] or existing.market_cap
-                    existing.high_52w = info["high_52w"] or existing.high_52w
-                    existing.low_52w = info["low_52w"] or existing.low_52w
-                    existing.history = history_str if "history" in info else existing.history
-                else:
-                    # New stock — add to cache
-                    stock = StockCache(
-                        symbol=info["symbol"],
-                        full_name=info["full_name"],
-                        name=info.get("name"),
-                        exchange=info.get("exchange"),
-                        price=info["price"],
-                        change=info.get("change"),
-                        percent_change=info.get("percent_change"),
-                        volume=info.get("volume"),
-                        pe_ratio=info.get("pe_ratio"),
-                        market_cap=info.get("market_cap"),
-                        high_52w=info.get("high_52w"),
-                        low_52w=info.get("low_52w"),
-                        history=history_str
-                    )
-                    db.add(stock)
-                    results.append(stock)
+    insert = dialect_insert(db)
+    chunk_size = max(1, chunk_size)
+
+    # RETURNING always yields the streamed fields; full rows only when asked for
+    if returning:
+        returned_cols = list(StockCache.__table__.columns)
+    else:
+        returned_cols = [StockCache.symbol] + [getattr(StockCache, f) for f in STREAM_FIELDS]
+
+    for start in range(0, len(unique), chunk_size):
+        stmt = insert(StockCache).values(unique[start:start + chunk_size])
+        new = stmt.excluded
+
+        merged = {}
+        for col in TEXT_KEEP_OLD:
+            merged[col] = func.coalesce(func.nullif(new[col], ""), getattr(StockCache, col))
+        for col in NUMBER_KEEP_OLD:
+            merged[col] = func.coalesce(func.nullif(new[col], 0), getattr(StockCache, col))
+        for col in NULL_KEEP_OLD:
+            merged[col] = func.coalesce(new[col], getattr(StockCache, col))
+
+        stmt = stmt.on_conflict_do_update(index_elements=["symbol"], set_=merged)
+
+        # Merged values come back from the same statement; no follow-up SELECT
+        merged_rows = [dict(row) for row in db.execute(stmt.returning(*returned_cols)).mappings()]
+        queue_price_deltas(db, [to_delta(row) for row in merged_rows])
+
+        if returning:
+            touched.extend(merged_rows)
+
+    return touched
+
+
+def build_price_bar(info: Dict) -> Optional[Dict]:
+    """
+    Converts a Finnhub info dict into a price_history bar.
+
+    A quote is a single price observation, so the bar's open/high/low/close
+    are all that price (the quote's session-level o/h/l are not bar values).
+    The quote's cumulative day volume is kept as `session_volume`;
+    append_price_bars() turns it into the volume traded during the bar.
+
+    Args:
+        info (dict): Output of finnhub_service.get_stock_info().
+
+    Returns:
+        dict: price_history row, or None when the quote has no price or timestamp.
+    """
+    if not info.get("price") or not info.get("quote_time"):
+        return None
+
+    price = info["price"]
+    return {
+        "symbol": info["symbol"],
+        "ts": int(info["quote_time"]),
+        "open": price,
+        "high": price,
+        "low": price,
+        "close": price,
+        "session_volume": info.get("volume"),
+    }
+
+
+def _same_utc_day(ts_a: int, ts_b: int) -> bool:
+    return ts_a // 86400 == ts_b // 86400
+
+
+def latest_bars(db: Session, symbols: List[str], chunk_size: int = UPSERT_CHUNK_SIZE) -> Dict[str, tuple]:
+    """
+    Returns (ts, session_volume) of the newest stored bar per symbol.
+    """
+    latest: Dict[str, tuple] = {}
+    chunk_size = max(1, chunk_size)
+    for start in range(0, len(symbols), chunk_size):
+        newest = (
+            select(PriceHistory.symbol, func.max(PriceHistory.ts).label("ts"))
+            .where(PriceHistory.symbol.in_(symbols[start:start + chunk_size]))
+            .group_by(PriceHistory.symbol)
+            .subquery()
+        )
+        stmt = select(PriceHistory.symbol, PriceHistory.ts, PriceHistory.session_volume).join(
+            newest, and_(PriceHistory.symbol == newest.c.symbol, PriceHistory.ts == newest.c.ts)
+        )
+        for symbol, ts, session_volume in db.execute(stmt):
+            latest[symbol] = (ts, session_volume)
+    return latest
 
+
+def append_price_bars(db: Session, bars: List[Dict], chunk_size: int = UPSERT_CHUNK_SIZE) -> int:
+    """
+    Appends bars to price_history with one multi-row INSERT per chunk.
+    Bars not newer than the symbol's latest stored bar are skipped, so
+    refreshing an unchanged quote (e.g. after the close) does not duplicate it.
+
+    Each bar's `volume` is its session volume minus the previous bar's on
+    the same UTC day (the whole session volume for the day's first bar, or
+    after a reset), so summing bars over any bucket gives the volume traded.
+
+    Does not commit; the caller owns the transaction.
+
+    Args:
+        db (Session): SQLAlchemy DB session.
+        bars (List[dict]): Rows produced by build_price_bar().
+        chunk_size (int): Maximum number of rows per statement.
+
+    Returns:
+        int: Number of distinct bars submitted.
+    """
+    by_key = {(bar["symbol"], bar["ts"]): bar for bar in bars}
+    if not by_key:
+        return 0
+
+    previous = latest_bars(db, sorted({symbol for symbol, _ in by_key}), chunk_size)
+    unique = []
+    for (symbol, ts), bar in sorted(by_key.items()):
+        prev = previous.get(symbol)
+        if prev and ts <= prev[0]:
+            continue
+        session_volume = bar.get("session_volume")
+        volume = session_volume
+        if (session_volume is not None and prev and prev[1] is not None
+                and _same_utc_day(prev[0], ts) and session_volume >= prev[1]):
+            volume = session_volume - prev[1]
+        unique.append({**bar, "volume": volume})
+        previous[symbol] = (ts, session_volume)
+
+    if not unique:
+        return 0
+
+    insert = dialect_insert(db)
+    chunk_size = max(1, chunk_size)
+    for start in range(0, len(unique), chunk_size):
+        stmt = insert(PriceHistory).values(unique[start:start + chunk_size])
+        db.execute(stmt.on_conflict_do_nothing(index_elements=["symbol", "ts"]))
+
+    return len(unique)
+
+
+def recent_closes(
+    db: Session,
+    symbols: List[str],
+    points: int = HISTORY_POINTS,
+    chunk_size: int = UPSERT_CHUNK_SIZE,
+) -> Dict[str, List[float]]:
+    """
+    Reads the latest `points` closes per symbol from price_history, oldest first.
+
+    One windowed query per chunk of symbols, limited to the last
+    HISTORY_WINDOW_SECONDS so each symbol is a bounded (symbol, ts) range scan.
+
+    Args:
+        db (Session): SQLAlchemy DB session.
+        symbols (List[str]): Symbols to read.
+        points (int): Maximum closes per symbol.
+        chunk_size (int): Symbols per IN (...) list.
+
+    Returns:
+        Dict[str, List[float]]: Closes per symbol (symbols without bars are absent).
+    """
+    cutoff = int(time.time()) - HISTORY_WINDOW_SECONDS
+    closes: Dict[str, List[float]] = {}
+    chunk_size = max(1, chunk_size)
+    for start in range(0, len(symbols), chunk_size):
+        ranked = (
+            select(
+                PriceHistory.symbol,
+                PriceHistory.ts,
+                PriceHistory.close,
+                func.row_number()
+                .over(partition_by=PriceHistory.symbol, order_by=PriceHistory.ts.desc())
+                .label("rank"),
+            )
+            .where(PriceHistory.symbol.in_(symbols[start:start + chunk_size]), PriceHistory.ts >= cutoff)
+            .subquery()
+        )
+        stmt = (
+            select(ranked.c.symbol, ranked.c.close)
+            .where(ranked.c.rank <= points)
+            .order_by(ranked.c.symbol, ranked.c.ts)
+        )
+        for symbol, close in db.execute(stmt):
+            closes.setdefault(symbol, []).append(close)
+    return closes
+
+
+def save_stock_infos(
+    db: Session,
+    infos: List[Dict],
+    chunk_size: int = UPSERT_CHUNK_SIZE,
+    returning: bool = False,
+) -> List[Dict]:
+    """
+    Writes fetched stock info to stock_cache (merged upsert) and appends
+    a bar per quote to price_history, in the caller's transaction.
+
+    The history (sparkline) of every symbol that got a new bar is rebuilt
+    from its recent price_history closes; other rows keep their stored one.
+
+    Args:
+        db (Session): SQLAlchemy DB session.
+        infos (List[dict]): Outputs of finnhub_service.get_stock_info().
+        chunk_size (int): Rows per batched statement.
+        returning (bool): If True, return the merged stock_cache rows.
+
+    Returns:
+        List[dict]: Merged rows when `returning` is set, else an empty list.
+    """
+    rows, bars = [], []
+    for info in infos:
+        try:
+            rows.append(build_cache_row(info))
+            bar = build_price_bar(info)
+            if bar:
+                bars.append(bar)
         except Exception as e:
-            print(f"[ERROR] Finnhub fetch failed for {symbol}: {e}")
+            logger.error("Could not prepare %s for storage: %s", info.get("symbol"), e)
+
+    append_price_bars(db, bars, chunk_size)
+    closes = recent_closes(db, sorted({bar["symbol"] for bar in bars}), chunk_size=chunk_size)
+    for row in rows:
+        if row["symbol"] in closes:
+            row["history"] = encode_history(closes[row["symbol"]])
+
+    return upsert_stock_rows(db, rows, chunk_size, returning=returning)
+
+
+def iter_cached_stocks(db: Session, batch_size: int = 500) -> Iterator[StockCache]:
+    """
+    Lazily streams every stock_cache row without materializing the table.
+
+    Rows are fetched from the server `batch_size` at a time via yield_per;
+    `history` is left in its stored form.
+
+    Args:
+        db (Session): SQLAlchemy DB session.
+        batch_size (int): Rows buffered per fetch.
+
+    Yields:
+        StockCache: One cached stock row at a time.
+    """
+    stmt = select(StockCache).order_by(StockCache.symbol).execution_options(yield_per=batch_size)
+    yield from db.scalars(stmt)
+
+
+def get_stock_data(
+    symbols: List[str],
+    db: Session,
+    chunk_size: int = UPSERT_CHUNK_SIZE,
+    returning: Literal["touched", "none"] = "touched",
+) -> List[Dict]:
+    """
+    Fetches live stock data for a list of symbols from Finnhub and
+    updates or inserts them into the local database.
+
+    Only the refreshed rows are returned; callers that need the whole
+    cache should stream it with iter_cached_stocks().
+
+    Args:
+        symbols (List[str]): List of stock ticker symbols (e.g., ["AAPL", "TSLA"]).
+        db (Session): SQLAlchemy DB session.
+        chunk_size (int): Rows per batched upsert statement.
+        returning (str): "touched" to return the refreshed rows, "none" to skip it.
+
+    Returns:
+        List[dict]: Refreshed rows with parsed history, or an empty list
+        when returning="none".
+    """
+    # Fetch every symbol up front; requests run concurrently over one pooled client.
+    # Profile / metrics are only requested where their TTL has lapsed.
+    fetched = get_stock_infos(symbols, parts=due_parts(db, symbols, chunk_size))
+
+    infos = [fetched[symbol] for symbol in symbols if fetched.get(symbol)]
 
-    # Commit all insertions/updates to the database
+    # Write all symbols (cache rows + history bars) in batched statements and commit once
+    touched = save_stock_infos(db, infos, chunk_size, returning=returning == "touched")
     db.commit()
+    stock_snapshot.invalidate()
 
-    # Fetch and format all entries with parsed history for return
-    final = db.query(StockCache).all()
-    for stock in final:
-        stock.history = sanitize_history_list(stock.history)
+    for row in touched:
+        row["history"] = decode_history(row["history"]).tolist()
 
-    return final
+    return touched
@@ -0,0 +1,315 @@
+import os
+import json
+import time
+import signal
+import logging
+import asyncio
+from datetime import date
+from typing import Dict, Iterable, List, Mapping
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+from websockets.asyncio.client import connect
+from websockets.exceptions import WebSocketException
+
+from app.database import SessionLocal
+from app.models.stock_cache import StockCache
+from app.services.finnhub_service import FINNHUB_API_KEY, QUOTE
+from app.services.market_calendar import in_session, trading_date
+from app.services.snapshot_cache import stock_snapshot
+from app.services.stock_service import save_stock_infos
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Finnhub trade websocket (point at finnhub_standin.py for local testing)
+FINNHUB_WS_URL = os.getenv("FINNHUB_WS_URL", "wss://ws.finnhub.io")
+
+# Seconds between coalesced flushes to stock_cache
+TRADE_FLUSH_INTERVAL = float(os.getenv("TRADE_FLUSH_INTERVAL", "1.0"))
+
+# Seconds before reconnecting after the feed drops
+TRADE_RECONNECT_SECONDS = float(os.getenv("TRADE_RECONNECT_SECONDS", "5"))
+
+# How often previous closes (used to derive change / percent_change) are reloaded
+PREV_CLOSE_RELOAD_SECONDS = float(os.getenv("PREV_CLOSE_RELOAD_SECONDS", "600"))
+
+
+class TickBuffer:
+    """
+    Latest trade per symbol since the last flush.
+
+    Every tick for a symbol overwrites the previous one, so memory and the
+    size of the next write are bounded by the number of symbols, not by the
+    tick rate.
+    """
+
+    def __init__(self):
+        self._latest: Dict[str, Dict] = {}
+        self.ticks = 0
+
+    def add(self, trade: Dict):
+        """
+        Records one Finnhub trade ({"s": symbol, "p": price, "t": ms, "v": volume}).
+        Out-of-order trades older than the buffered one are ignored.
+        """
+        symbol, price = trade.get("s"), trade.get("p")
+        if not symbol or price is None:
+            return
+        self.ticks += 1
+        current = self._latest.get(symbol)
+        if current is None or trade.get("t", 0) >= current.get("t", 0):
+            self._latest[symbol] = trade
+
+    def drain(self) -> Dict[str, Dict]:
+        """Returns the buffered ticks and starts a new interval."""
+        latest, self._latest = self._latest, {}
+        return latest
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+
+def parse_message(raw) -> List[Dict]:
+    """
+    Extracts trades from one Finnhub websocket message.
+
+    Finnhub sends {"type": "trade", "data": [{"s", "p", "t", "v", "c"}, ...]}
+    and {"type": "ping"} keep-alives; anything else yields no trades.
+    """
+    try:
+        message = json.loads(raw)
+    except ValueError:
+        return []
+    if not isinstance(message, dict) or message.get("type") != "trade":
+        return []
+    return [t for t in message.get("data") or [] if isinstance(t, dict)]
+
+
+class PrevCloses:
+    """
+    Previous close per symbol, rolled over at each exchange's session boundary.
+
+    Seeded from stock_cache as price - change. Afterwards every tick is
+    dated in its exchange's timezone; the first tick of a new trading date
+    makes the last regular-session price seen on the previous date the new
+    previous close, so change / percent_change restart each session.
+    """
+
+    def __init__(self):
+        self.closes: Dict[str, float] = {}
+        self.days: Dict[str, date] = {}
+        self.last_prices: Dict[str, float] = {}
+        self.exchanges: Dict[str, str] = {}
+
+    def load(self, rows: Iterable):
+        """
+        Merges stored (symbol, exchange, price, change, last_updated) rows.
+
+        A stored close only replaces the tracked one when it belongs to the
+        trading date this instance is on (or the symbol isn't tracked yet),
+        so a reload never undoes a rollover the REST refresh hasn't seen.
+        """
+        for symbol, exchange, price, change, last_updated in rows:
+            self.exchanges[symbol] = exchange
+            if not price or change is None:
+                continue
+            day = trading_date(exchange, last_updated or time.time())
+            known = self.days.get(symbol)
+            if known is None:
+                self.days[symbol], self.last_prices[symbol] = day, price
+            if known is None or day == known:
+                self.closes[symbol] = price - change
+
+    def observe(self, ticks: Mapping[str, Dict]):
+        """Rolls symbols whose tick starts a new trading date, then records the tick prices."""
+        for symbol, tick in ticks.items():
+            exchange = self.exchanges.get(symbol)
+            at = tick.get("t", 0) / 1000 or time.time()
+            day = trading_date(exchange, at)
+            known = self.days.get(symbol)
+            if known is not None and day > known and symbol in self.last_prices:
+                self.closes[symbol] = self.last_prices.pop(symbol)
+            if known is None or day >= known:
+                self.days[symbol] = day
+                if in_session(exchange, at):
+                    self.last_prices[symbol] = float(tick["p"])
+
+
+def ticks_to_infos(ticks: Dict[str, Dict], prev_closes: Mapping[str, float]) -> List[Dict]:
+    """
+    Converts buffered ticks into quote-only info dicts for save_stock_infos().
+
+    Change and percent change are derived from the previous close. Symbols
+    without one are skipped rather than written with a moving price next to
+    a stale change; fields the feed doesn't carry are omitted so the upsert
+    keeps stored values.
+    """
+    infos = []
+    for symbol, tick in ticks.items():
+        prev_close = prev_closes.get(symbol)
+        if not prev_close:
+            continue
+        price = float(tick["p"])
+        change = round(price - prev_close, 4)
+        percent_change = round(change / prev_close * 100, 4)
+        infos.append({
+            "symbol": symbol,
+            "parts": (QUOTE,),
+            "price": price,
+            "change": change,
+            "percent_change": percent_change,
+        })
+    return infos
+
+
+class TradeIngestor:
+    """
+    Consumes the streaming trade feed and writes coalesced quotes.
+
+    One task reads the websocket into a TickBuffer; another flushes the
+    buffer every `flush_interval` seconds with a single batched upsert,
+    so thousands of ticks per second become one write per interval.
+    Committed rows reach /stocks/stream subscribers through the usual
+    price-delta path.
+    """
+
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        url: str = FINNHUB_WS_URL,
+        flush_interval: float = TRADE_FLUSH_INTERVAL,
+    ):
+        self.symbols = sorted(set(symbols))
+        self.url = url
+        self.flush_interval = flush_interval
+        self.buffer = TickBuffer()
+        self.prev_closes = PrevCloses()
+        self.prev_closes_loaded_at = 0.0
+        self.rows_written = 0
+        self._stopping = asyncio.Event()
+
+    def load_prev_closes(self):
+        """Previous close per symbol, recovered as price - change from stock_cache."""
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(StockCache.symbol, StockCache.exchange, StockCache.price, StockCache.change, StockCache.last_updated)
+                .where(StockCache.symbol.in_(self.symbols))
+            ).all()
+        finally:
+            db.close()
+        self.prev_closes.load(rows)
+        self.prev_closes_loaded_at = time.time()
+
+    def _write(self, infos: List[Dict]):
+        db = SessionLocal()
+        try:
+            save_stock_infos(db, infos)
+            db.commit()
+            stock_snapshot.invalidate()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def flush(self) -> int:
+        """
+        Writes the buffered ticks, if any.
+
+        Returns:
+            int: Number of symbols written.
+        """
+        ticks = self.buffer.drain()
+        if not ticks:
+            return 0
+        if time.time() - self.prev_closes_loaded_at >= PREV_CLOSE_RELOAD_SECONDS:
+            await asyncio.to_thread(self.load_prev_closes)
+        self.prev_closes.observe(ticks)
+        infos = ticks_to_infos(ticks, self.prev_closes.closes)
+        if not infos:
+            return 0
+        await asyncio.to_thread(self._write, infos)
+        self.rows_written += len(infos)
+        return len(infos)
+
+    async def _flush_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception("Trade flush failed: %s", e)
+
+    async def _consume(self):
+        params = f"?token={FINNHUB_API_KEY}" if FINNHUB_API_KEY else ""
+        while not self._stopping.is_set():
+            try:
+                async with connect(self.url + params) as ws:
+                    for symbol in self.symbols:
+                        await ws.send(json.dumps({"type": "subscribe", "symbol": symbol}))
+                    logger.info("Subscribed to %d symbols on %s", len(self.symbols), self.url)
+
+                    stop = asyncio.ensure_future(self._stopping.wait())
+                    try:
+                        while True:
+                            recv = asyncio.ensure_future(ws.recv())
+                            done, _ = await asyncio.wait({recv, stop}, return_when=asyncio.FIRST_COMPLETED)
+                            if stop in done:
+                                recv.cancel()
+                                return
+                            for trade in parse_message(recv.result()):
+                                self.buffer.add(trade)
+                    finally:
+                        stop.cancel()
+            except (OSError, WebSocketException) as e:
+                logger.warning("Trade feed disconnected: %s; reconnecting in %.0fs", e, TRADE_RECONNECT_SECONDS)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), TRADE_RECONNECT_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run(self):
+        """
+        Runs until stop() is called (or SIGINT/SIGTERM); the last buffered
+        ticks are flushed before returning.
+        """
+        self._install_signal_handlers()
+        await asyncio.to_thread(self.load_prev_closes)
+
+        flusher = asyncio.create_task(self._flush_loop())
+        try:
+            await self._consume()
+        finally:
+            self.stop()
+            await flusher
+            await self.flush()
+        logger.info("Trade ingestion stopped (%d ticks, %d rows written)", self.buffer.ticks, self.rows_written)
+
+    def stop(self):
+        """Asks run() to disconnect and return after a final flush."""
+        self._stopping.set()
+
+    def _install_signal_handlers(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Not supported on this platform / not the main thread
+                pass
+
+
+def cached_symbols() -> List[str]:
+    """Every symbol currently in stock_cache."""
+    db = SessionLocal()
+    try:
+        return list(db.scalars(select(StockCache.symbol).order_by(StockCache.symbol)))
+    finally:
+        db.close()
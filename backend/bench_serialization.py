@@ -0,0 +1,103 @@
+# bench_serialization.py
+#
+# Compares the per-request CPU cost of serializing GET /stocks:
+#   python bench_serialization.py [--rows 1000 10000] [--history 30]
+
+import os
+import time
+import json
+import random
+import argparse
+
+# The models import the engine; this benchmark never touches a database
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+from app.models.stock_cache import StockCache
+from app.schemas.stock import Stock
+from app.serialization import dumps
+from app.services.history_codec import decode_history, encode_history
+
+
+def make_rows(n: int, history_points: int):
+    """Synthetic stock_cache rows, as returned by a Core select."""
+    rows = []
+    for i in range(n):
+        price = random.uniform(5, 900)
+        rows.append({
+            "symbol": f"SYM{i:05d}",
+            "full_name": f"Company {i} Inc.",
+            "name": f"Company {i}",
+            "exchange": "NASDAQ NMS - GLOBAL MARKET",
+            "price": price,
+            "change": random.uniform(-5, 5),
+            "percent_change": random.uniform(-3, 3),
+            "volume": random.randint(0, 50_000_000),
+            "pe_ratio": random.uniform(5, 60),
+            "market_cap": random.uniform(1e2, 3e6),
+            "high_52w": price * 1.3,
+            "low_52w": price * 0.7,
+            "history": encode_history([price * random.uniform(0.9, 1.1) for _ in range(history_points)]),
+            "last_updated": int(time.time()),
+            "profile_updated_at": int(time.time()),
+            "metrics_updated_at": int(time.time()),
+        })
+    return rows
+
+
+def cpu_per_call(fn, min_seconds: float = 1.0):
+    """Mean CPU seconds per call (process time), repeating for at least `min_seconds`."""
+    fn()  # warm up
+    calls, start = 0, time.process_time()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.process_time() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+
+def bench(n: int, history_points: int):
+    stored = make_rows(n, history_points)
+
+    # Previous behaviour: ORM instances with history mutated into a list,
+    # encoded by FastAPI's jsonable_encoder and then json.dumps
+    orm_objects = []
+    for row in stored:
+        obj = StockCache(**{**row, "history": None})
+        obj.history = decode_history(row["history"]).tolist()
+        orm_objects.append(obj)
+
+    list_rows = [{**row, "history": decode_history(row["history"]).tolist()} for row in stored]
+    array_rows = [{**row, "history": decode_history(row["history"])} for row in stored]
+    adapter = TypeAdapter(list[Stock])
+    cached_body = dumps(array_rows)
+
+    cases = [
+        ("ORM + jsonable_encoder + json", lambda: json.dumps(jsonable_encoder(orm_objects)).encode("utf-8")),
+        ("dict rows + json.dumps", lambda: json.dumps(list_rows, separators=(",", ":")).encode("utf-8")),
+        ("pydantic list[Stock] dump_json", lambda: adapter.dump_json(adapter.validate_python(list_rows))),
+        ("dict rows + orjson (ndarray history)", lambda: dumps(array_rows)),
+        ("cached snapshot bytes", lambda: Response(content=cached_body, media_type="application/json")),
+    ]
+
+    print(f"\n{n} rows, {history_points} history points, body {len(cached_body) / 1024:.0f} KiB")
+    baseline = None
+    for name, fn in cases:
+        per_call = cpu_per_call(fn)
+        baseline = baseline or per_call
+        print(f"  {name:<38} {per_call * 1000:10.3f} ms CPU/request   {baseline / per_call:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark GET /stocks serialization paths.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--history", type=int, default=30, help="history points per stock")
+    args = parser.parse_args()
+
+    random.seed(42)
+    for n in args.rows:
+        bench(n, args.history)
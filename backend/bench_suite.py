@@ -0,0 +1,436 @@
+# bench_suite.py
+#
+# Offline load and throughput benchmarks; prints (or writes) one JSON
+# document so runs can be diffed between commits:
+#
+#   python bench_suite.py --output bench.json
+#   python bench_suite.py --sizes 20 1000 --requests 500 --latency-ms 50 --error-rate 0.02
+#   BENCH_POSTGRES_URL=postgresql://... python bench_suite.py      # also run against Postgres
+#
+# Finnhub is replaced by finnhub_standin.py (started on a free local port
+# with the requested latency / error injection) and the database by a
+# throwaway SQLite file. BENCH_POSTGRES_URL must point at a disposable
+# database: its stock_cache, watchlist, price_history and refresh_log
+# tables are emptied.
+#
+# Each database is benchmarked in its own worker process, since the app
+# binds its engine when it is imported.
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+import tracemalloc
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BENCH_USER = "bench-user"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline MarketMuse load and throughput benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 1000, 10000], help="stock_cache sizes for HTTP runs")
+    parser.add_argument("--requests", type=int, default=300, help="requests per endpoint and size")
+    parser.add_argument("--concurrency", type=int, default=8, help="in-flight HTTP requests")
+    parser.add_argument("--memory-requests", type=int, default=10, help="requests traced with tracemalloc per endpoint")
+    parser.add_argument("--accept-encoding", default="identity", help="Accept-Encoding sent by the HTTP client")
+    parser.add_argument("--watchlist-size", type=int, default=None, help="symbols watched by the bench user (default: all)")
+    parser.add_argument("--history", type=int, default=30, help="history points per seeded stock")
+    parser.add_argument("--refresh-symbols", type=int, default=200, help="symbols refreshed per refresh run")
+    parser.add_argument("--refresh-concurrency", type=int, default=8, help="concurrent fetch workers for refresh runs")
+    parser.add_argument("--latency-ms", type=float, default=20, help="stand-in latency per Finnhub call")
+    parser.add_argument("--latency-jitter-ms", type=float, default=5, help="stand-in latency standard deviation")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stand-in calls answered 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of stand-in calls answered 429")
+    parser.add_argument("--rate-per-minute", type=float, default=1e9, help="client-side Finnhub budget (60 = free tier)")
+    parser.add_argument("--output", default="-", help="JSON result path ('-' for stdout)")
+    # Set by the parent process for each database worker
+    parser.add_argument("--worker-database", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-result", help=argparse.SUPPRESS)
+    parser.add_argument("--standin-url", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def log(message: str):
+    """Progress goes to stderr so stdout stays a clean JSON document."""
+    print(message, file=sys.stderr, flush=True)
+
+
+# --------------------------------------------------------------------------
+# Parent: stand-in server and one worker per database
+# --------------------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def standin_server(args):
+    """Runs finnhub_standin.py under uvicorn for the duration of the block."""
+    import httpx
+
+    port = free_port()
+    env = {
+        **os.environ,
+        "STANDIN_LATENCY_MS": str(args.latency_ms),
+        "STANDIN_LATENCY_JITTER_MS": str(args.latency_jitter_ms),
+        "STANDIN_ERROR_RATE": str(args.error_rate),
+        "STANDIN_RATE_LIMIT_RATE": str(args.rate_limit_rate),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "finnhub_standin:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                httpx.get(f"{url}/stock/profile2", params={"symbol": "PING"}, timeout=1)
+                break  # any answer (even an injected error) means it is up
+            except httpx.HTTPError:
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise RuntimeError("Finnhub stand-in did not start")
+                time.sleep(0.2)
+        yield url
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    argv = list(sys.argv[1:] if argv is None else argv)
+
+    with tempfile.TemporaryDirectory(prefix="marketmuse-bench-") as workdir:
+        targets = [("sqlite", f"sqlite:///{os.path.join(workdir, 'bench.db')}")]
+        if os.getenv("BENCH_POSTGRES_URL"):
+            targets.append(("postgresql", os.environ["BENCH_POSTGRES_URL"]))
+
+        results = {}
+        with standin_server(args) as standin_url:
+            for name, url in targets:
+                log(f"🏁 Benchmarking {name}...")
+                result_path = os.path.join(workdir, f"{name}.json")
+                subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), *argv,
+                     "--worker-database", url, "--worker-result", result_path, "--standin-url", standin_url],
+                    cwd=BACKEND_DIR,
+                    stdout=sys.stderr,
+                    check=True,
+                )
+                with open(result_path) as fh:
+                    results[name] = json.load(fh)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": int(time.time()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if not k.startswith(("worker_", "standin_"))},
+        },
+        "databases": results,
+    }
+    body = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(body)
+    else:
+        with open(args.output, "w") as fh:
+            fh.write(body + "\n")
+        log(f"✅ Results written to {args.output}")
+
+
+# --------------------------------------------------------------------------
+# Worker: runs against one database inside its own process
+# --------------------------------------------------------------------------
+
+def configure_worker_env(args, workdir: str):
+    """Points the app at the bench database and the stand-in before it is imported."""
+    os.environ["DATABASE_URL"] = args.worker_database
+    os.environ["FINNHUB_BASE_URL"] = args.standin_url
+    os.environ["FINNHUB_API_KEY"] = "bench"
+    os.environ["FINNHUB_RATE_PER_MINUTE"] = str(args.rate_per_minute)
+    if args.rate_per_minute >= 1e6:
+        os.environ["FINNHUB_RATE_BURST"] = "1e6"  # effectively unlimited: measure the pipeline itself
+    os.environ["FINNHUB_RATE_STATE_FILE"] = os.path.join(workdir, "finnhub_bucket.json")
+    os.environ["LOG_LEVEL"] = "WARNING"
+    os.environ["LOG_FORMAT"] = "text"
+    os.environ["ACCESS_LOG_SAMPLE_RATE"] = "0"
+
+    # auth.py needs a Firebase app at import; tokens are never verified here
+    import firebase_admin
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(options={"projectId": "marketmuse-bench"})
+
+
+def percentile_ms(samples, q: float) -> float:
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def finnhub_totals():
+    """Cumulative Finnhub call counters, for per-run deltas."""
+    from app.services.finnhub_service import call_summary
+
+    totals = {"calls": 0, "errors": 0, "retries": 0, "upstream_seconds": 0.0, "rate_limit_wait_seconds": 0.0}
+    for s in call_summary().values():
+        totals["calls"] += s["calls"]
+        totals["errors"] += sum(n for status, n in s["statuses"].items() if status != "200")
+        totals["retries"] += s["retries"]
+        totals["upstream_seconds"] += s["seconds"]
+        totals["rate_limit_wait_seconds"] += s["rate_limit_wait"]
+    return totals
+
+
+def clear_tables(db):
+    from sqlalchemy import delete
+    from app.models.price_history import PriceHistory
+    from app.models.refresh_log_model import RefreshLog
+    from app.models.stock_cache import StockCache
+    from app.models.watchlist import Watchlist
+
+    for model in (Watchlist, PriceHistory, RefreshLog, StockCache):
+        db.execute(delete(model))
+    db.commit()
+
+
+def synthetic_info(symbol: str, history_points: int, parts=None) -> dict:
+    import random
+    from app.services.finnhub_service import ALL_PARTS
+
+    price = random.uniform(5, 900)
+    return {
+        "symbol": symbol,
+        "parts": ALL_PARTS if parts is None else parts,
+        "full_name": f"{symbol} Corp",
+        "name": f"{symbol} Corp",
+        "exchange": "STAND-IN EXCHANGE",
+        "price": price,
+        "change": random.uniform(-5, 5),
+        "percent_change": random.uniform(-3, 3),
+        "volume": random.randint(0, 50_000_000),
+        "pe_ratio": random.uniform(5, 60),
+        "market_cap": random.uniform(1e2, 3e6),
+        "high_52w": price * 1.3,
+        "low_52w": price * 0.7,
+        "history": [price * random.uniform(0.9, 1.1) for _ in range(history_points)],
+    }
+
+
+def seed_stocks(db, symbols, history_points: int, parts=None):
+    from app.services.stock_service import build_cache_row, upsert_stock_rows
+
+    upsert_stock_rows(db, [build_cache_row(synthetic_info(s, history_points, parts)) for s in symbols])
+    db.commit()
+
+
+def bench_refresh(args, db):
+    """
+    Symbols/second for get_stock_data and both refresh scripts, each run
+    refreshing every part of `--refresh-symbols` stale symbols.
+    """
+    from sqlalchemy import func, select, update
+    from app.models.stock_cache import StockCache
+    from app.services.stock_service import get_stock_data
+    import refresh_all_stocks
+    import refresh_stock_cache
+
+    symbols = [f"RF{i:05d}" for i in range(args.refresh_symbols)]
+    clear_tables(db)
+    seed_stocks(db, symbols, args.history, parts=())
+
+    def run_all_stocks():
+        refresh_all_stocks.SYMBOLS = symbols
+        refresh_all_stocks.main()
+
+    runs = {
+        "get_stock_data": lambda: get_stock_data(symbols, db),
+        "refresh_all_stocks": run_all_stocks,
+        "refresh_stock_cache": lambda: refresh_stock_cache.main(limit=len(symbols), concurrency=args.refresh_concurrency),
+    }
+
+    results = {}
+    for name, run in runs.items():
+        # Make every symbol fully stale again
+        db.execute(update(StockCache).values(last_updated=None, profile_updated_at=None, metrics_updated_at=None))
+        db.commit()
+
+        before = finnhub_totals()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stderr):
+            run()
+        elapsed = time.perf_counter() - start
+        after = finnhub_totals()
+
+        db.expire_all()
+        refreshed = db.scalar(select(func.count()).select_from(StockCache).where(StockCache.last_updated.is_not(None)))
+        results[name] = {
+            "symbols": len(symbols),
+            "refreshed": refreshed,
+            "seconds": round(elapsed, 3),
+            "symbols_per_second": round(refreshed / elapsed, 2) if elapsed else None,
+            **{key: round(after[key] - before[key], 3) for key in after},
+        }
+        log(f"  🔄 {name}: {results[name]['symbols_per_second']} symbols/s ({refreshed}/{len(symbols)} refreshed)")
+    return results
+
+
+async def _load(app, path: str, total: int, concurrency: int, headers: dict) -> dict:
+    """Issues `total` GETs with `concurrency` in flight; latency per request."""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        for _ in range(5):
+            await client.get(path)  # warm caches and the snapshot
+
+        latencies, statuses, sizes = [], {}, []
+        remaining = iter(range(total))
+
+        async def worker():
+            for _ in remaining:
+                start = time.perf_counter()
+                resp = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+                sizes.append(len(resp.content))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        wall = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p99_ms": percentile_ms(latencies, 99),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 3),
+        "rps": round(total / wall, 1),
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+        "body_bytes": int(np.median(sizes)),
+    }
+
+
+async def _memory(app, path: str, count: int, headers: dict) -> dict:
+    """
+    Peak traced allocation per request (tracemalloc, all threads). Includes
+    the in-process client's copy of the response body.
+    """
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        await client.get(path)
+        peaks = []
+        tracemalloc.start()
+        try:
+            for _ in range(count):
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                await client.get(path)
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "peak_kib_mean": round(float(np.mean(peaks)) / 1024, 1),
+        "peak_kib_max": round(max(peaks) / 1024, 1),
+    }
+
+
+def bench_http(args, db, app):
+    """p50/p99/RPS and memory per request for the read endpoints at each table size."""
+    from app.auth import get_current_user
+    from app.models.user import User
+    from app.models.watchlist import Watchlist
+    from app.services.snapshot_cache import stock_snapshot
+
+    if db.get(User, BENCH_USER) is None:
+        db.add(User(uid=BENCH_USER, email="bench@example.com", name="Bench", picture="", is_admin=False))
+        db.commit()
+    app.dependency_overrides[get_current_user] = lambda: User(
+        uid=BENCH_USER, email="bench@example.com", name="Bench", picture="", is_admin=False,
+    )
+
+    endpoints = ["/stocks/", "/stocks/?sort=-percent_change&limit=100", "/watchlist/", "/watchlist/stocks"]
+    headers = {"Accept-Encoding": args.accept_encoding}
+
+    clear_tables(db)
+    results, seeded = {}, 0
+    for size in sorted(args.sizes):
+        # Grow the table to `size` rows and the watchlist with it
+        new_symbols = [f"ST{i:05d}" for i in range(seeded, size)]
+        seed_stocks(db, new_symbols, args.history)
+        watched = size if args.watchlist_size is None else min(size, args.watchlist_size)
+        db.add_all(Watchlist(user_id=BENCH_USER, symbol=f"ST{i:05d}") for i in range(min(seeded, watched), watched))
+        db.commit()
+        seeded = size
+        stock_snapshot.invalidate()
+
+        results[str(size)] = {}
+        for path in endpoints:
+            stats = asyncio.run(_load(app, path, args.requests, args.concurrency, headers))
+            stats.update(asyncio.run(_memory(app, path, args.memory_requests, headers)))
+            results[str(size)][path] = stats
+            log(f"  🌐 {size:>6} symbols {path:<42} p50 {stats['p50_ms']:>8.2f} ms  "
+                f"p99 {stats['p99_ms']:>8.2f} ms  {stats['rps']:>8.1f} rps  {stats['peak_kib_mean']:>8.1f} KiB")
+
+    app.dependency_overrides.pop(get_current_user, None)
+    return results
+
+
+def run_worker(args):
+    with tempfile.TemporaryDirectory(prefix="marketmuse-bench-worker-") as workdir:
+        configure_worker_env(args, workdir)
+
+        from app.main import app
+        from app.database import Base, SessionLocal, engine
+        # Tables the API itself never imports still need creating
+        from app.models.price_history import PriceHistory  # noqa: F401
+        from app.models.refresh_log_model import RefreshLog  # noqa: F401
+
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            result = {
+                "dialect": engine.dialect.name,
+                "refresh": bench_refresh(args, db),
+                "http": bench_http(args, db, app),
+            }
+            clear_tables(db)
+        finally:
+            db.close()
+
+    with open(args.worker_result, "w") as fh:
+        json.dump(result, fh)
+
+
+if __name__ == "__main__":
+    cli_args = parse_args()
+    if cli_args.worker_database:
+        run_worker(cli_args)
+    else:
+        main()
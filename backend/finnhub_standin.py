@@ -0,0 +1,152 @@
+# finnhub_standin.py
+#
+# Local stand-in for Finnhub's trade websocket and the REST endpoints the
+# refresh scripts call (/quote, /stock/profile2, /stock/metric), for testing
+# and benchmarking without an API key or market hours:
+#
+#   uvicorn finnhub_standin:app --port 8765
+#   FINNHUB_WS_URL=ws://localhost:8765/ws python ingest_trades.py
+#   FINNHUB_BASE_URL=http://localhost:8765 python refresh_stock_cache.py
+
+import os
+import json
+import time
+import random
+import asyncio
+import zlib
+from typing import Optional
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+# Trades generated per second across all subscribed symbols
+TRADES_PER_SECOND = int(os.getenv("STANDIN_TRADES_PER_SECOND", "1000"))
+
+# Messages sent per second (trades are grouped into "data" arrays like Finnhub does)
+MESSAGES_PER_SECOND = int(os.getenv("STANDIN_MESSAGES_PER_SECOND", "20"))
+
+# REST latency injection: mean and standard deviation per request (milliseconds)
+LATENCY_MS = float(os.getenv("STANDIN_LATENCY_MS", "0"))
+LATENCY_JITTER_MS = float(os.getenv("STANDIN_LATENCY_JITTER_MS", "0"))
+
+# REST error injection: fractions of requests answered 500 / 429
+ERROR_RATE = float(os.getenv("STANDIN_ERROR_RATE", "0"))
+RATE_LIMIT_RATE = float(os.getenv("STANDIN_RATE_LIMIT_RATE", "0"))
+
+app = FastAPI(title="Finnhub stand-in")
+
+
+async def _inject() -> Optional[JSONResponse]:
+    """Sleeps for the configured latency; returns an error response for injected failures."""
+    delay = random.gauss(LATENCY_MS, LATENCY_JITTER_MS) if LATENCY_JITTER_MS else LATENCY_MS
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+
+    roll = random.random()
+    if roll < ERROR_RATE:
+        return JSONResponse({"error": "Injected server error"}, status_code=500)
+    if roll < ERROR_RATE + RATE_LIMIT_RATE:
+        return JSONResponse({"error": "API limit reached."}, status_code=429, headers={"Retry-After": "1"})
+    return None
+
+
+def _base_price(symbol: str) -> float:
+    """Stable per-symbol price level, so repeated runs see the same magnitudes."""
+    return 20 + zlib.crc32(symbol.encode("utf-8")) % 48000 / 100
+
+
+@app.get("/quote")
+async def quote(symbol: str):
+    error = await _inject()
+    if error:
+        return error
+    prev_close = _base_price(symbol)
+    price = round(prev_close * (1 + random.gauss(0, 0.01)), 2)
+    return {
+        "c": price,
+        "d": round(price - prev_close, 2),
+        "dp": round((price - prev_close) / prev_close * 100, 4),
+        "h": round(max(price, prev_close) * 1.005, 2),
+        "l": round(min(price, prev_close) * 0.995, 2),
+        "o": prev_close,
+        "pc": prev_close,
+        "t": int(time.time()),
+        "v": random.randint(1_000, 50_000_000),
+    }
+
+
+@app.get("/stock/profile2")
+async def profile(symbol: str):
+    error = await _inject()
+    if error:
+        return error
+    return {"name": f"{symbol} Corp", "exchange": "STAND-IN EXCHANGE", "ticker": symbol}
+
+
+@app.get("/stock/metric")
+async def metric(symbol: str, metric: str = "all"):
+    error = await _inject()
+    if error:
+        return error
+    base = _base_price(symbol)
+    return {
+        "symbol": symbol,
+        "metric": {
+            "peNormalizedAnnual": round(5 + base % 55, 2),
+            "marketCapitalization": round(base * 1000, 2),
+            "52WeekHigh": round(base * 1.3, 2),
+            "52WeekLow": round(base * 0.7, 2),
+        },
+    }
+
+
+@app.websocket("/ws")
+async def trades(websocket: WebSocket):
+    """
+    Speaks the Finnhub websocket protocol: clients send
+    {"type": "subscribe"|"unsubscribe", "symbol": ...} and receive
+    {"type": "trade", "data": [{"s", "p", "t", "v", "c"}, ...]} messages
+    with random-walk prices, plus periodic {"type": "ping"}.
+    """
+    await websocket.accept()
+    prices = {}
+
+    async def read_subscriptions():
+        while True:
+            message = json.loads(await websocket.receive_text())
+            symbol = message.get("symbol")
+            if message.get("type") == "subscribe" and symbol:
+                prices.setdefault(symbol, random.uniform(20, 500))
+            elif message.get("type") == "unsubscribe":
+                prices.pop(symbol, None)
+
+    reader = asyncio.create_task(read_subscriptions())
+    per_message = max(1, TRADES_PER_SECOND // MESSAGES_PER_SECOND)
+    sent = 0
+    try:
+        while True:
+            await asyncio.sleep(1 / MESSAGES_PER_SECOND)
+            if reader.done():
+                break   # client went away
+            sent += 1
+            if sent % (MESSAGES_PER_SECOND * 10) == 0:
+                await websocket.send_text(json.dumps({"type": "ping"}))
+            if not prices:
+                continue
+
+            now_ms = int(time.time() * 1000)
+            data = []
+            for symbol in random.choices(list(prices), k=per_message):
+                prices[symbol] = max(0.01, prices[symbol] * (1 + random.gauss(0, 0.0005)))
+                data.append({
+                    "s": symbol,
+                    "p": round(prices[symbol], 2),
+                    "t": now_ms,
+                    "v": random.randint(1, 500),
+                    "c": None,
+                })
+            await websocket.send_text(json.dumps({"type": "trade", "data": data}))
+    except (WebSocketDisconnect, RuntimeError):
+        # Client closed while a send was in flight
+        pass
+    finally:
+        reader.cancel()
@@ -0,0 +1,35 @@
+# ingest_trades.py
+
+import argparse
+import asyncio
+from app.logging_config import setup_logging
+from app.services.trade_stream import (
+    FINNHUB_WS_URL,
+    TRADE_FLUSH_INTERVAL,
+    TradeIngestor,
+    cached_symbols,
+)
+
+
+def main(symbols=None, url: str = FINNHUB_WS_URL, flush_interval: float = TRADE_FLUSH_INTERVAL):
+    """
+    Streams trades for the given symbols (default: every symbol in
+    stock_cache) and writes coalesced quotes until SIGINT/SIGTERM.
+    """
+    symbols = symbols or cached_symbols()
+    if not symbols:
+        print("⚠️ No symbols found in stock_cache.")
+        return
+    asyncio.run(TradeIngestor(symbols, url, flush_interval).run())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest streaming trades into stock_cache.")
+    parser.add_argument("--symbols", help="comma-separated symbols (default: all cached)")
+    parser.add_argument("--url", default=FINNHUB_WS_URL, help="trade websocket URL")
+    parser.add_argument("--flush-interval", type=float, default=TRADE_FLUSH_INTERVAL, help="seconds between writes")
+    args = parser.parse_args()
+    setup_logging("text")
+
+    wanted = [s.strip().upper() for s in args.symbols.split(",") if s.strip()] if args.symbols else None
+    main(wanted, args.url, args.flush_interval)
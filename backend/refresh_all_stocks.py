@@ -1,8 +1,10 @@
 # refresh_all_stocks.py
 
-from app.services.finnhub_service import get_stock_info
+from app.services.finnhub_service import get_stock_infos, format_call_summary
 from app.database import SessionLocal
-from app.models.stock_cache import StockCache
+from app.services.stock_service import due_parts, save_stock_infos, UPSERT_CHUNK_SIZE
+from app.services.snapshot_cache import stock_snapshot
+from app.logging_config import setup_logging
 
 # List of stock symbols to refresh from Finnhub
 # You can expand this list as needed
@@ -12,63 +14,39 @@ SYMBOLS = [
     "PEP"  # Currently testing with one symbol
 ]
 
-def main():
+def main(chunk_size: int = UPSERT_CHUNK_SIZE):
     """
     Refreshes stock data for the symbols listed in SYMBOLS.
-    Updates or inserts entries in the local stock_cache table.
+    Updates or inserts entries in the local stock_cache table and appends
+    to price_history using the shared batched writes from stock_service,
+    then prints a per-endpoint summary of the Finnhub calls made.
     """
     db = SessionLocal()
 
+    # Fetch all symbols concurrently before writing; profile / metrics only
+    # where their TTL has lapsed, so a quote-only refresh is one call per symbol
+    print(f"🔄 Refreshing {len(SYMBOLS)} symbols...")
+    fetched = get_stock_infos(SYMBOLS, parts=due_parts(db, SYMBOLS, chunk_size))
+
+    infos = []
     for symbol in SYMBOLS:
-        print(f"🔄 Refreshing {symbol}...")
-        info = get_stock_info(symbol)
+        info = fetched.get(symbol)
 
         if not info:
             print(f"⚠️ Skipped {symbol}")
             continue
 
-        # Convert list of floats to a comma-separated string
-        history_str = ",".join(str(x) for x in info.get("history", []))
-
-        # Check if stock already exists in DB
-        existing = db.query(StockCache).filter_by(symbol=symbol).first()
-
-        if existing:
-            # Update fields with fresh data
-            existing.full_name = info["full_name"]
-            existing.name = info["name"]
-            existing.exchange = info["exchange"]
-            existing.price = info["price"]
-            existing.change = info["change"]
-            existing.percent_change = info["percent_change"]
-            existing.volume = info["volume"]
-            existing.pe_ratio = info["pe_ratio"]
-            existing.market_cap = info["market_cap"]
-            existing.high_52w = info["high_52w"]
-            existing.low_52w = info["low_52w"]
-            existing.history = history_str
-        else:
-            # Add new entry to the stock_cache table
-            stock = StockCache(
-                symbol=info["symbol"],
-                full_name=info["full_name"],
-                name=info.get("name"),
-                exchange=info.get("exchange"),
-                price=info["price"],
-                change=info.get("change"),
-                percent_change=info.get("percent_change"),
-                volume=info.get("volume"),
-                pe_ratio=info.get("pe_ratio"),
-                market_cap=info.get("market_cap"),
-                high_52w=info.get("high_52w"),
-                low_52w=info.get("low_52w"),
-                history=history_str
-            )
-            db.add(stock)
+        infos.append(info)
 
+    # One multi-row upsert per chunk instead of a SELECT + UPDATE per symbol,
+    # plus one bulk append of the new quotes to price_history
+    save_stock_infos(db, infos, chunk_size)
     db.commit()
+    stock_snapshot.invalidate()
     db.close()
     print("✅ Done refreshing all stocks.")
+    print("📈 Finnhub calls:\n" + format_call_summary())
 
 if __name__ == "__main__":
+    setup_logging("text")
     main()
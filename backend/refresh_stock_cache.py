@@ -1,104 +1,61 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import select, desc
-from app.database import SessionLocal
-from app.models.stock_cache import StockCache
-from app.models.refresh_log_model import RefreshLog
-from app.models.settings_model import Setting
-from app.services.stock_service import get_stock_data
-
-
-def get_symbols_from_db(db: Session):
-    """
-    Fetch all unique stock symbols from the stock_cache table.
+import os
+import argparse
+import asyncio
+from typing import Optional
+from app.logging_config import setup_logging
+from app.metrics import start_metrics_server
+from app.services.finnhub_service import DEFAULT_CONCURRENCY, format_call_summary
+from app.services.refresh_scheduler import RefreshScheduler, REFRESH_BATCH_SIZE
+
+
+def main(limit: int = REFRESH_BATCH_SIZE, concurrency: int = DEFAULT_CONCURRENCY):
+    """
+    GitHub Actions-compatible stock refresher (one-shot mode of RefreshScheduler):
+    - Loads every symbol in stock_cache with its last refresh time and watcher count
+    - Picks the `limit` most urgent symbols (staleness x (1 + watchers))
+    - Fetches them concurrently within the Finnhub rate budget
+    - Writes them and their refresh_log entries in one transaction
+    - Trims log table to last 10 rows
+    - Prints a per-endpoint summary of the Finnhub calls it made
     """
-    results = db.execute(select(StockCache.symbol)).scalars().all()
-    return results
+    try:
+        asyncio.run(RefreshScheduler(batch_size=limit, concurrency=concurrency).run_once())
+    except Exception as outer:
+        print(f"🚨 Unexpected error in main(): {outer}")
+    print("📈 Finnhub calls:\n" + format_call_summary())
 
 
-def get_last_index(db: Session) -> int:
-    """
-    Reads the last_index value from the settings table.
-    Returns 0 if the key doesn't exist yet.
+def run_daemon(
+    batch_size: int = REFRESH_BATCH_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    metrics_port: Optional[int] = None,
+):
     """
-    result = db.query(Setting).filter_by(key="last_index").first()
-    if result:
-        return int(result.value)
-    return 0
+    Long-running refresh service; stops gracefully on SIGINT/SIGTERM.
 
-
-def set_last_index(db: Session, index: int):
-    """
-    Writes the updated last_index back to the settings table.
-    Creates the row if it doesn't exist.
+    With `metrics_port`, Finnhub call metrics are served on
+    http://0.0.0.0:<port>/metrics for Prometheus while it runs.
     """
-    entry = db.query(Setting).filter_by(key="last_index").first()
-    if entry:
-        entry.value = str(index)
-    else:
-        entry = Setting(key="last_index", value=str(index))
-        db.add(entry)
-    db.commit()
+    if metrics_port:
+        start_metrics_server(metrics_port)
+        print(f"📈 Metrics on :{metrics_port}/metrics")
+    asyncio.run(RefreshScheduler(batch_size=batch_size, concurrency=concurrency).run_forever())
+    print("📈 Finnhub calls:\n" + format_call_summary())
 
 
-def trim_refresh_log(db: Session, keep_last_n: int = 10):
-    """
-    Keep only the most recent N refresh_log entries.
-    Deletes older rows to avoid memory bloat.
-    """
-    ids_to_keep = (
-        db.query(RefreshLog.id)
-        .order_by(desc(RefreshLog.refreshed_at))
-        .limit(keep_last_n)
-        .all()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh stock_cache from Finnhub.")
+    parser.add_argument("--daemon", action="store_true", help="keep running and refresh continuously")
+    parser.add_argument("--limit", type=int, default=REFRESH_BATCH_SIZE, help="symbols per run/batch")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="concurrent fetch workers")
+    parser.add_argument(
+        "--metrics-port", type=int, default=int(os.getenv("REFRESH_METRICS_PORT", "0")) or None,
+        help="serve Prometheus metrics on this port (daemon mode)",
     )
-    if ids_to_keep:
-        keep_ids = [r.id for r in ids_to_keep]
-        db.query(RefreshLog).filter(~RefreshLog.id.in_(keep_ids)).delete(synchronize_session=False)
-        db.commit()
+    args = parser.parse_args()
+    setup_logging("text")
 
-
-def main():
-    """
-    GitHub Actions-compatible stock refresher that:
-    - Retrieves list of stock symbols from DB
-    - Uses round-robin index stored in settings
-    - Refreshes 1 stock per run
-    - Logs to refresh_log table
-    - Updates round-robin index in DB
-    - Trims log table to last 10 rows
-    """
-    db: Session = SessionLocal()
-
-    try:
-        symbols = get_symbols_from_db(db)
-        if not symbols:
-            print("⚠️ No symbols found in stock_cache.")
-            return
-
-        i = get_last_index(db)
-        symbol = symbols[i % len(symbols)]
-        print(f"🔄 Refreshing {symbol} (index {i})...")
-
-        try:
-            get_stock_data([symbol], db)
-            db.add(RefreshLog(symbol=symbol, status="success"))
-            db.commit()
-            print(f"✅ {symbol} refreshed successfully.")
-        except Exception as e:
-            db.rollback()
-            db.add(RefreshLog(symbol=symbol, status=f"error: {e}"))
-            db.commit()
-            print(f"❌ Error refreshing {symbol}: {e}")
-
-        # Update last_index in settings
-        set_last_index(db, i + 1)
-
-        # Trim refresh_log table
-        trim_refresh_log(db)
-
-    except Exception as outer:
-        print(f"🚨 Unexpected error in main(): {outer}")
-
-
-if __name__ == "__main__":
-    main()
+    if args.daemon:
+        run_daemon(args.limit, args.concurrency, args.metrics_port)
+    else:
+        main(args.limit, args.concurrency)
@@ -0,0 +1,107 @@
+# test_history_points.py
+
+import os
+import time
+import tempfile
+
+import firebase_admin
+from fastapi.testclient import TestClient
+
+# Scratch SQLite file; must be set before the app's engine is created
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'marketmuse_test.db')}")
+
+# auth.py needs a Firebase app at import; tokens are never verified here
+if not firebase_admin._apps:
+    firebase_admin.initialize_app(options={"projectId": "marketmuse-test"})
+
+from app.auth import get_current_user
+from app.database import Base, SessionLocal, engine
+from app.main import app
+from app.models.user import User
+from app.models.watchlist import Watchlist
+from app.services.snapshot_cache import stock_snapshot
+from app.services.stock_service import HISTORY_POINTS, append_price_bars, build_price_bar, save_stock_infos
+
+SYMBOL = "LTTB"
+TEST_USER = "history-points-user"
+POINTS = 20
+
+
+def close_at(i: int) -> float:
+    # A wave with a few spikes, so LTTB has shape to keep
+    return round(100 + 10 * ((i % 40) - 20) / 20 + (25 if i % 53 == 0 else 0), 2)
+
+
+def quote(i: int, t: int) -> dict:
+    return {"symbol": SYMBOL, "parts": ("quote",), "price": close_at(i), "quote_time": t, "volume": 1000 + i,
+            "change": 0.0, "percent_change": 0.0}
+
+
+def seed_long_series() -> list:
+    """
+    Stores HISTORY_POINTS + 50 minute bars for SYMBOL through the refresh
+    write path and returns the closes stock_cache.history should hold.
+    """
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    count = HISTORY_POINTS + 50
+    start = int(time.time()) - count * 60
+    with SessionLocal() as db:
+        append_price_bars(db, [build_price_bar(quote(i, start + i * 60)) for i in range(count - 1)])
+        # The last quote goes through the regular refresh write, which rebuilds history
+        last = quote(count - 1, start + (count - 1) * 60)
+        save_stock_infos(db, [{**last, "parts": ("quote", "profile", "metrics"), "name": "LTTB Corp",
+                               "full_name": "LTTB Corp", "exchange": "NASDAQ"}])
+        db.add(User(uid=TEST_USER, email="points@example.com", name="Points", picture="", is_admin=False))
+        db.add(Watchlist(user_id=TEST_USER, symbol=SYMBOL))
+        db.commit()
+    stock_snapshot.invalidate()
+    return [close_at(i) for i in range(count - HISTORY_POINTS, count)]
+
+
+def client() -> TestClient:
+    app.dependency_overrides[get_current_user] = lambda: User(
+        uid=TEST_USER, email="points@example.com", name="Points", picture="", is_admin=False,
+    )
+    return TestClient(app)
+
+
+def assert_downsampled(history: list, closes: list):
+    assert len(history) == POINTS
+    # LTTB keeps the endpoints and only ever picks real points, in order
+    assert history[0] == closes[0] and history[-1] == closes[-1]
+    assert set(history) <= set(closes)
+    # The spikes are the most significant points of their buckets
+    assert max(history) == max(closes)
+
+
+def test_stocks_points_downsamples_the_stored_series():
+    closes = seed_long_series()
+    with client() as http:
+        full = http.get("/stocks/").json()
+        assert [s["history"] for s in full] == [closes]
+
+        for path in (f"/stocks/?points={POINTS}", f"/stocks/?points={POINTS}&fields=symbol,history&limit=10"):
+            (stock,) = http.get(path).json()
+            assert_downsampled(stock["history"], closes)
+
+
+def test_watchlist_stocks_points_downsamples_the_stored_series():
+    closes = seed_long_series()
+    with client() as http:
+        (full,) = http.get("/watchlist/stocks").json()
+        assert full["history"] == closes
+
+        (stock,) = http.get(f"/watchlist/stocks?points={POINTS}").json()
+        assert_downsampled(stock["history"], closes)
+        # Same budget, same series: the rendering is deterministic
+        assert http.get(f"/stocks/?points={POINTS}").json()[0]["history"] == stock["history"]
+
+
+if __name__ == "__main__":
+    # Runs without pytest: python test_history_points.py
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print("✅", test.__name__)
@@ -0,0 +1,115 @@
+# test_market_calendar.py
+
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+from app.services.market_calendar import (
+    INDIA_EQUITIES,
+    POST_CLOSE_GRACE_SECONDS,
+    US_EQUITIES,
+    market_for,
+    should_refresh,
+)
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+def ts(year, month, day, hour, minute=0, tz=NEW_YORK) -> float:
+    """UNIX seconds for a wall-clock time in the given zone."""
+    return datetime(year, month, day, hour, minute, tzinfo=tz).timestamp()
+
+
+def test_bundled_holidays_fall_on_weekdays():
+    for market in (US_EQUITIES, INDIA_EQUITIES):
+        for day in market.holidays | set(market.early_closes):
+            assert day.weekday() < 5, f"{market.code} {day} is a weekend"
+
+
+def test_holiday_tables_cover_the_current_year():
+    # Fails once a year passes without its holiday table being added
+    year = date.today().year
+    for market in (US_EQUITIES, INDIA_EQUITIES):
+        assert year in {day.year for day in market.holidays}, f"{market.code} has no {year} holidays"
+
+
+def test_exchange_names_map_to_markets():
+    assert market_for("NASDAQ NMS - GLOBAL MARKET") is US_EQUITIES
+    assert market_for("NEW YORK STOCK EXCHANGE, INC.") is US_EQUITIES
+    assert market_for("NATIONAL STOCK EXCHANGE OF INDIA") is INDIA_EQUITIES
+    assert market_for("LONDON STOCK EXCHANGE") is None
+    assert market_for("NSE") is INDIA_EQUITIES and market_for("BSE LTD") is INDIA_EQUITIES
+    # NSE / BSE only as whole words
+    assert market_for("HANSEATISCHE WERTPAPIERBOERSE HAMBURG") is None
+    assert market_for(None) is None
+
+
+def test_us_session_hours():
+    # Wednesday 2025-03-12
+    assert US_EQUITIES.is_open(datetime(2025, 3, 12, 9, 30, tzinfo=NEW_YORK))
+    assert US_EQUITIES.is_open(datetime(2025, 3, 12, 15, 59, tzinfo=NEW_YORK))
+    assert not US_EQUITIES.is_open(datetime(2025, 3, 12, 9, 29, tzinfo=NEW_YORK))
+    assert not US_EQUITIES.is_open(datetime(2025, 3, 12, 16, 0, tzinfo=NEW_YORK))
+    # Same instant expressed in UTC
+    assert US_EQUITIES.is_open(datetime(2025, 3, 12, 14, 0, tzinfo=timezone.utc))
+
+
+def test_us_weekends_holidays_and_early_closes():
+    assert US_EQUITIES.session(date(2025, 3, 15)) is None        # Saturday
+    assert US_EQUITIES.session(date(2025, 7, 4)) is None         # Independence Day
+    assert US_EQUITIES.session(date(2026, 7, 3)) is None         # observed (July 4 is a Saturday)
+    assert US_EQUITIES.session(date(2027, 12, 24)) is None       # observed Christmas
+    _, close = US_EQUITIES.session(date(2025, 11, 28))           # day after Thanksgiving
+    assert (close.hour, close.minute) == (13, 0)
+
+
+def test_india_session_hours():
+    kolkata = ZoneInfo("Asia/Kolkata")
+    assert INDIA_EQUITIES.is_open(datetime(2025, 3, 12, 9, 15, tzinfo=kolkata))
+    assert not INDIA_EQUITIES.is_open(datetime(2025, 3, 12, 15, 30, tzinfo=kolkata))
+    assert not INDIA_EQUITIES.is_open(datetime(2025, 10, 21, 11, 0, tzinfo=kolkata))  # Diwali
+
+
+def test_last_close_skips_weekend():
+    close = US_EQUITIES.last_close(datetime(2025, 3, 16, 12, 0, tzinfo=NEW_YORK))  # Sunday
+    assert close == datetime(2025, 3, 14, 16, 0, tzinfo=NEW_YORK)
+
+
+def test_refresh_during_session_and_grace_period():
+    nasdaq = "NASDAQ NMS - GLOBAL MARKET"
+    assert should_refresh(nasdaq, ts(2025, 3, 12, 11), now=ts(2025, 3, 12, 11, 5))
+    # Just after the close, still inside the grace window
+    assert should_refresh(nasdaq, ts(2025, 3, 12, 16), now=ts(2025, 3, 12, 16, 1))
+
+
+def test_single_post_close_snapshot():
+    nasdaq = "NASDAQ NMS - GLOBAL MARKET"
+    settled = ts(2025, 3, 12, 16) + POST_CLOSE_GRACE_SECONDS
+    evening = ts(2025, 3, 12, 20)
+
+    # Last refresh was during the session: take the post-close snapshot
+    assert should_refresh(nasdaq, ts(2025, 3, 12, 15, 58), now=evening)
+    # Snapshot already taken: nothing more until the next open
+    assert not should_refresh(nasdaq, settled + 60, now=evening)
+    assert not should_refresh(nasdaq, settled + 60, now=ts(2025, 3, 13, 9, 29))
+    assert should_refresh(nasdaq, settled + 60, now=ts(2025, 3, 13, 9, 30))
+
+
+def test_closed_over_weekend_and_holidays():
+    nasdaq = "NASDAQ NMS - GLOBAL MARKET"
+    friday_snapshot = ts(2025, 4, 17, 17)   # Thursday before Good Friday, after close
+    assert not should_refresh(nasdaq, friday_snapshot, now=ts(2025, 4, 18, 12))  # Good Friday
+    assert not should_refresh(nasdaq, friday_snapshot, now=ts(2025, 4, 19, 12))  # Saturday
+    assert should_refresh(nasdaq, None, now=ts(2025, 4, 19, 12))                  # never refreshed
+
+
+def test_unknown_exchange_always_refreshes():
+    assert should_refresh("LONDON STOCK EXCHANGE", ts(2025, 3, 15, 12), now=ts(2025, 3, 15, 12, 5))
+    assert should_refresh(None, None)
+
+
+if __name__ == "__main__":
+    # Runs without pytest: python test_market_calendar.py
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print("✅", test.__name__)
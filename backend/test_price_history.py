@@ -0,0 +1,83 @@
+# test_price_history.py
+
+import os
+import tempfile
+from decimal import Decimal
+from datetime import datetime, timezone
+
+import msgpack
+import orjson
+import pyarrow as pa
+
+# Scratch SQLite file; must be set before the app's engine is created
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'marketmuse_test.db')}")
+
+from app.database import Base, SessionLocal, engine
+from app.models.price_history import PriceHistory
+from app.serialization import ARROW, JSON, MSGPACK
+from app.services.history_service import query_price_history, rows_to_candles
+from app.services.stock_formats import render_candles
+from app.services.stock_service import append_price_bars, build_price_bar
+
+
+def ts(day, hour, minute=0) -> int:
+    return int(datetime(2025, 6, day, hour, minute, tzinfo=timezone.utc).timestamp())
+
+
+def fresh_session():
+    Base.metadata.drop_all(bind=engine, tables=[PriceHistory.__table__])
+    Base.metadata.create_all(bind=engine, tables=[PriceHistory.__table__])
+    return SessionLocal()
+
+
+def quote(t, price, volume):
+    return build_price_bar({"symbol": "AAPL", "price": price, "quote_time": t, "volume": volume,
+                            "open": 1.0, "high": 999.0, "low": 0.5})
+
+
+def test_bars_are_single_price_snapshots():
+    bar = quote(ts(2, 14), 101.5, 1000)
+    assert (bar["open"], bar["high"], bar["low"], bar["close"]) == (101.5, 101.5, 101.5, 101.5)
+    assert bar["session_volume"] == 1000
+
+
+def test_bar_volume_is_the_delta_of_session_volume():
+    with fresh_session() as db:
+        append_price_bars(db, [quote(ts(2, 14), 100, 100), quote(ts(2, 15), 101, 250)])
+        # A later refresh continues from the stored bar; the next day starts over
+        append_price_bars(db, [quote(ts(2, 16), 102, 400), quote(ts(3, 14), 103, 50)])
+
+        raw = query_price_history(db, "AAPL", ts(1, 0), ts(4, 0))
+        assert raw["v"] == [100, 150, 150, 50]
+
+        daily = query_price_history(db, "AAPL", ts(1, 0), ts(4, 0), resolution="D")
+        assert daily["v"] == [400, 50]
+        assert (daily["o"], daily["h"], daily["l"], daily["c"]) == ([100, 103], [102, 103], [100, 103], [102, 103])
+
+
+def test_unchanged_quote_is_not_appended_again():
+    with fresh_session() as db:
+        append_price_bars(db, [quote(ts(2, 20), 100, 900)])
+        assert append_price_bars(db, [quote(ts(2, 20), 100, 900)]) == 0
+        assert query_price_history(db, "AAPL", ts(1, 0), ts(4, 0))["v"] == [900]
+
+
+def test_decimal_aggregates_encode_in_every_format():
+    # Postgres returns SUM(bigint) as numeric, i.e. Decimal through psycopg2
+    rows = [(ts(2, 0), 100.0, 102.0, 99.5, 101.0, Decimal("400")),
+            (ts(3, 0), 101.0, 103.0, 100.0, 103.0, Decimal("50"))]
+    payload = {"symbol": "AAPL", "resolution": "D", **rows_to_candles(rows)}
+    assert payload["v"] == [400, 50] and all(type(v) is int for v in payload["v"])
+
+    assert orjson.loads(render_candles(JSON, payload))["v"] == [400, 50]
+    assert msgpack.unpackb(render_candles(MSGPACK, payload))["v"] == [400, 50]
+    table = pa.ipc.open_stream(render_candles(ARROW, payload)).read_all()
+    assert table.column("v").to_pylist() == [400, 50]
+
+
+if __name__ == "__main__":
+    # Runs without pytest: python test_price_history.py
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print("✅", test.__name__)
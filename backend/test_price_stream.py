@@ -0,0 +1,63 @@
+# test_price_stream.py
+
+import os
+import time
+import tempfile
+from types import SimpleNamespace
+
+# Scratch SQLite file; must be set before the app's engine is created
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'marketmuse_test.db')}")
+
+from app.database import Base, SessionLocal, engine
+from app.models.price_history import PriceHistory
+from app.models.stock_cache import StockCache
+from app.services.price_stream import NotifyListener, PriceBroadcaster
+from app.services.snapshot_cache import stock_snapshot
+from app.services.stock_service import save_stock_infos
+
+
+def cached_snapshot():
+    """Caches a snapshot and returns a probe telling whether the next get() rebuilds it."""
+    stock_snapshot.invalidate()
+    stock_snapshot.get(lambda: ([], b"old"))
+
+    def rebuilt() -> bool:
+        return stock_snapshot.get(lambda: ([], b"new")).body == b"new"
+    return rebuilt
+
+
+def test_commit_from_another_session_invalidates_snapshot():
+    tables = [StockCache.__table__, PriceHistory.__table__]
+    Base.metadata.drop_all(bind=engine, tables=tables)
+    Base.metadata.create_all(bind=engine, tables=tables)
+    rebuilt = cached_snapshot()
+
+    # A refresh in its own session; nothing calls invalidate() explicitly
+    with SessionLocal() as db:
+        save_stock_infos(db, [{"symbol": "AAPL", "parts": ("quote",), "price": 101.0, "change": 1.0,
+                               "percent_change": 1.0, "quote_time": int(time.time())}])
+        assert not rebuilt()
+        db.commit()
+
+    assert rebuilt()
+
+
+def test_notify_from_another_process_invalidates_snapshot():
+    rebuilt = cached_snapshot()
+    listener = NotifyListener(engine, PriceBroadcaster())
+
+    # Stand-in for the LISTEN connection after a refresh process committed
+    notify = SimpleNamespace(payload='[{"symbol": "AAPL", "price": 101.0}]')
+    listener._conn = SimpleNamespace(poll=lambda: None, notifies=[notify])
+    listener._on_readable()
+
+    assert rebuilt()
+    assert listener._conn.notifies == []
+
+
+if __name__ == "__main__":
+    # Runs without pytest: python test_price_stream.py
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print("✅", test.__name__)
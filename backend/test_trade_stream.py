@@ -0,0 +1,64 @@
+# test_trade_stream.py
+
+import os
+import tempfile
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# trade_stream imports the app's engine; nothing is written here
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'marketmuse_test.db')}")
+
+from app.services.trade_stream import PrevCloses, ticks_to_infos
+
+NEW_YORK = ZoneInfo("America/New_York")
+NASDAQ = "NASDAQ NMS - GLOBAL MARKET"
+
+
+def ms(day, hour, minute=0) -> int:
+    """Trade timestamp (UNIX ms) for a New York wall-clock time in June 2025."""
+    return int(datetime(2025, 6, day, hour, minute, tzinfo=NEW_YORK).timestamp() * 1000)
+
+
+def tick(price, t) -> dict:
+    return {"s": "AAPL", "p": price, "t": t, "v": 10}
+
+
+def test_symbols_without_a_previous_close_are_not_written():
+    infos = ticks_to_infos({"AAPL": tick(101, ms(2, 10)), "NEW": {**tick(5, ms(2, 10)), "s": "NEW"}}, {"AAPL": 100.0})
+    assert [(i["symbol"], i["change"], i["percent_change"]) for i in infos] == [("AAPL", 1.0, 1.0)]
+
+
+def test_previous_close_rolls_over_at_the_next_session():
+    closes = PrevCloses()
+    # Stored Monday quote: 104 with change +4 => previous close 100
+    closes.load([("AAPL", NASDAQ, 104.0, 4.0, ms(2, 15) / 1000)])
+
+    closes.observe({"AAPL": tick(110, ms(2, 15, 59))})
+    assert closes.closes["AAPL"] == 100
+    # After-hours trades still compare against Friday's close and don't set Monday's
+    closes.observe({"AAPL": tick(111, ms(2, 18))})
+    assert ticks_to_infos({"AAPL": tick(111, ms(2, 18))}, closes.closes)[0]["change"] == 11
+
+    # First Tuesday tick: Monday's last regular-session price becomes the close
+    closes.observe({"AAPL": tick(112, ms(3, 9, 31))})
+    assert closes.closes["AAPL"] == 110
+    assert ticks_to_infos({"AAPL": tick(112, ms(3, 9, 31))}, closes.closes)[0]["change"] == 2
+
+
+def test_reload_does_not_undo_a_rollover():
+    closes = PrevCloses()
+    closes.load([("AAPL", NASDAQ, 104.0, 4.0, ms(2, 15) / 1000)])
+    closes.observe({"AAPL": tick(110, ms(2, 15, 59))})
+    closes.observe({"AAPL": tick(112, ms(3, 9, 31))})
+
+    # stock_cache still holds Monday's REST quote
+    closes.load([("AAPL", NASDAQ, 104.0, 4.0, ms(2, 15) / 1000)])
+    assert closes.closes["AAPL"] == 110
+
+
+if __name__ == "__main__":
+    # Runs without pytest: python test_trade_stream.py
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print("✅", test.__name__)
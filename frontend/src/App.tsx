@@ -64,12 +64,31 @@ function MainApp() {
     }
   };
 
-  // On login: fetch stocks and refetch every 60s
+  // On login: fetch stocks, then keep prices live over the server push stream.
+  // A slow full refetch remains as a fallback (e.g. for newly added symbols).
   useEffect(() => {
     if (isAuthenticated) {
       fetchStocks();
-      const interval = setInterval(fetchStocks, 60000);
-      return () => clearInterval(interval);
+      const interval = setInterval(fetchStocks, 300000);
+
+      const source = new EventSource("https://api.marketmuse.chinmaymisra.com/stocks/stream");
+      source.addEventListener("prices", (event) => {
+        const deltas: Pick<Stock, "symbol" | "price" | "change" | "percent_change" | "volume">[] =
+          JSON.parse((event as MessageEvent).data);
+        const bySymbol = new Map(deltas.map((d) => [d.symbol, d]));
+        setStocks((prev) =>
+          prev.map((stock) => {
+            const delta = bySymbol.get(stock.symbol);
+            return delta ? { ...stock, ...delta } : stock;
+          })
+        );
+        setLastUpdated(new Date().toLocaleTimeString());
+      });
+
+      return () => {
+        clearInterval(interval);
+        source.close();
+      };
     }
   }, [isAuthenticated, user]);
 
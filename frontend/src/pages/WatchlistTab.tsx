@@ -23,16 +23,11 @@ export default function WatchlistTab() {
         setLoading(true); // Show loading indicator
         const token = await user.getIdToken();
 
-        // Fetch all cached stocks
-        const res = await axios.get("https://api.marketmuse.chinmaymisra.com/stocks", {
+        // Fetch only the watched stocks (joined server-side)
+        const res = await axios.get<Stock[]>("https://api.marketmuse.chinmaymisra.com/watchlist/stocks", {
           headers: { Authorization: `Bearer ${token}` },
         });
-
-        // Filter down to user's watchlist
-        const filtered = res.data.filter((stock: Stock) =>
-          watchlist.includes(stock.symbol)
-        );
-        setStocks(filtered);
+        setStocks(res.data);
       } catch (err) {
         console.error("Failed to load watchlist stocks:", err);
         setStocks([]);